@@ -1,26 +1,175 @@
 import random
-from typing import List
+import logging
+import sys
+from collections import deque
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import List, Sequence
 import requests
 from urllib.parse import quote
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Restaurant:
+    name: str
+    address: str
+    phone: str
+    rating: float
+    price_range: str
+    opentable_url: str
+    # Interned identity used to track recently used restaurants
+    key: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'key', sys.intern(f"{self.name}_{self.address}"))
+
+
+# Static mock search results, built once at import
+_RESTAURANT_DATA = MappingProxyType({
+    "Thai": (
+        Restaurant(
+            name="Thai Garden Restaurant",
+            address="123 Market St, San Francisco, CA",
+            phone="(415) 555-0123",
+            rating=4.5,
+            price_range="$$",
+            opentable_url="https://www.opentable.com/r/thai-garden-san-francisco"
+        ),
+        Restaurant(
+            name="Golden Thai Cuisine",
+            address="456 Union Square, San Francisco, CA",
+            phone="(415) 555-0456",
+            rating=4.3,
+            price_range="$$$",
+            opentable_url="https://www.opentable.com/r/golden-thai-san-francisco"
+        ),
+        Restaurant(
+            name="Spice House Thai",
+            address="789 Mission St, San Francisco, CA",
+            phone="(415) 555-0789",
+            rating=4.2,
+            price_range="$$",
+            opentable_url="https://www.opentable.com/r/spice-house-thai-sf"
+        )
+    ),
+    "Chinese": (
+        Restaurant(
+            name="Dragon Palace",
+            address="321 Chinatown, San Francisco, CA",
+            phone="(415) 555-1234",
+            rating=4.6,
+            price_range="$$$",
+            opentable_url="https://www.opentable.com/r/dragon-palace-sf"
+        ),
+        Restaurant(
+            name="Golden Dragon Restaurant",
+            address="654 Grant Ave, San Francisco, CA",
+            phone="(415) 555-5678",
+            rating=4.4,
+            price_range="$$",
+            opentable_url="https://www.opentable.com/r/golden-dragon-sf"
+        ),
+        Restaurant(
+            name="Jade Garden Chinese",
+            address="987 Stockton St, San Francisco, CA",
+            phone="(415) 555-9876",
+            rating=4.1,
+            price_range="$$",
+            opentable_url="https://www.opentable.com/r/jade-garden-sf"
+        )
+    ),
+    "Indian": (
+        Restaurant(
+            name="Taj Mahal Indian Cuisine",
+            address="159 Folsom St, San Francisco, CA",
+            phone="(415) 555-1590",
+            rating=4.7,
+            price_range="$$$",
+            opentable_url="https://www.opentable.com/r/taj-mahal-sf"
+        ),
+        Restaurant(
+            name="Spice Route Indian",
+            address="357 Valencia St, San Francisco, CA",
+            phone="(415) 555-3570",
+            rating=4.3,
+            price_range="$$",
+            opentable_url="https://www.opentable.com/r/spice-route-sf"
+        ),
+        Restaurant(
+            name="Mumbai Palace",
+            address="741 Mission St, San Francisco, CA",
+            phone="(415) 555-7410",
+            rating=4.2,
+            price_range="$$",
+            opentable_url="https://www.opentable.com/r/mumbai-palace-sf"
+        )
+    )
+})
+
+# Generic per-cuisine fallbacks; the address is filled in with the location
+_FALLBACK_RESTAURANTS = MappingProxyType({
+    "Thai": Restaurant(
+        name="Local Thai Restaurant",
+        address="",
+        phone="(555) 123-4567",
+        rating=4.0,
+        price_range="$$",
+        opentable_url="https://www.opentable.com"
+    ),
+    "Chinese": Restaurant(
+        name="Local Chinese Restaurant",
+        address="",
+        phone="(555) 234-5678",
+        rating=4.0,
+        price_range="$$",
+        opentable_url="https://www.opentable.com"
+    ),
+    "Indian": Restaurant(
+        name="Local Indian Restaurant",
+        address="",
+        phone="(555) 345-6789",
+        rating=4.0,
+        price_range="$$",
+        opentable_url="https://www.opentable.com"
+    )
+})
+
 
 class CuisineSelector:
     """Handles cuisine selection and restaurant discovery"""
     
-    CUISINES = ["Thai", "Chinese", "Indian"]
+    __slots__ = ('last_selected_cuisine', '_used_order', '_used_set', '_rng')
+    
+    CUISINES: tuple = ("Thai", "Chinese", "Indian")
+    MAX_USED_RESTAURANTS = 10
     
     def __init__(self):
         self.last_selected_cuisine = None
-        self.used_restaurants = set()
+        # Per-instance generator so booking threads don't share the module-level one
+        self._rng = random.Random()
+        # Recently used restaurants: deque keeps insertion order, set gives O(1) lookups
+        self._used_order = deque(maxlen=self.MAX_USED_RESTAURANTS)
+        self._used_set = set()
+    
+    def _mark_used(self, restaurant_key: str):
+        """Remember a restaurant, evicting the oldest once the window is full"""
+        if restaurant_key in self._used_set:
+            return
+        if len(self._used_order) == self._used_order.maxlen:
+            self._used_set.discard(self._used_order[0])
+        self._used_order.append(restaurant_key)
+        self._used_set.add(restaurant_key)
     
     def select_random_cuisine(self) -> str:
         """Select a random cuisine from the available options"""
-        cuisine = random.choice(self.CUISINES)
+        cuisine = self._rng.choice(self.CUISINES)
         self.last_selected_cuisine = cuisine
         return cuisine
     
     def search_restaurants(self, cuisine: str, location: str, day: str, 
-                          time: str, party_size: int) -> List[dict]:
+                          time: str, party_size: int) -> Sequence[Restaurant]:
         """
         Search for restaurants using web search
         Returns a list of restaurant candidates
@@ -33,127 +182,20 @@ class CuisineSelector:
             # Google Places API, Yelp API, or a web search API
             return self._mock_restaurant_search(cuisine, location, party_size)
         except Exception as e:
-            print(f"Error searching restaurants: {e}")
+            logger.error("Error searching restaurants: %s", e)
             return self._get_fallback_restaurants(cuisine, location)
     
-    def _mock_restaurant_search(self, cuisine: str, location: str, party_size: int) -> List[dict]:
+    def _mock_restaurant_search(self, cuisine: str, location: str, party_size: int) -> Sequence[Restaurant]:
         """Mock restaurant search results for demonstration"""
-        
-        restaurant_data = {
-            "Thai": [
-                {
-                    "name": "Thai Garden Restaurant",
-                    "address": "123 Market St, San Francisco, CA",
-                    "phone": "(415) 555-0123",
-                    "rating": 4.5,
-                    "price_range": "$$",
-                    "opentable_url": "https://www.opentable.com/r/thai-garden-san-francisco"
-                },
-                {
-                    "name": "Golden Thai Cuisine",
-                    "address": "456 Union Square, San Francisco, CA", 
-                    "phone": "(415) 555-0456",
-                    "rating": 4.3,
-                    "price_range": "$$$",
-                    "opentable_url": "https://www.opentable.com/r/golden-thai-san-francisco"
-                },
-                {
-                    "name": "Spice House Thai",
-                    "address": "789 Mission St, San Francisco, CA",
-                    "phone": "(415) 555-0789",
-                    "rating": 4.2,
-                    "price_range": "$$",
-                    "opentable_url": "https://www.opentable.com/r/spice-house-thai-sf"
-                }
-            ],
-            "Chinese": [
-                {
-                    "name": "Dragon Palace",
-                    "address": "321 Chinatown, San Francisco, CA",
-                    "phone": "(415) 555-1234",
-                    "rating": 4.6,
-                    "price_range": "$$$",
-                    "opentable_url": "https://www.opentable.com/r/dragon-palace-sf"
-                },
-                {
-                    "name": "Golden Dragon Restaurant", 
-                    "address": "654 Grant Ave, San Francisco, CA",
-                    "phone": "(415) 555-5678",
-                    "rating": 4.4,
-                    "price_range": "$$",
-                    "opentable_url": "https://www.opentable.com/r/golden-dragon-sf"
-                },
-                {
-                    "name": "Jade Garden Chinese",
-                    "address": "987 Stockton St, San Francisco, CA",
-                    "phone": "(415) 555-9876",
-                    "rating": 4.1,
-                    "price_range": "$$",
-                    "opentable_url": "https://www.opentable.com/r/jade-garden-sf"
-                }
-            ],
-            "Indian": [
-                {
-                    "name": "Taj Mahal Indian Cuisine",
-                    "address": "159 Folsom St, San Francisco, CA",
-                    "phone": "(415) 555-1590",
-                    "rating": 4.7,
-                    "price_range": "$$$",
-                    "opentable_url": "https://www.opentable.com/r/taj-mahal-sf"
-                },
-                {
-                    "name": "Spice Route Indian",
-                    "address": "357 Valencia St, San Francisco, CA",
-                    "phone": "(415) 555-3570",
-                    "rating": 4.3,
-                    "price_range": "$$",
-                    "opentable_url": "https://www.opentable.com/r/spice-route-sf"
-                },
-                {
-                    "name": "Mumbai Palace",
-                    "address": "741 Mission St, San Francisco, CA",
-                    "phone": "(415) 555-7410",
-                    "rating": 4.2,
-                    "price_range": "$$",
-                    "opentable_url": "https://www.opentable.com/r/mumbai-palace-sf"
-                }
-            ]
-        }
-        
-        return restaurant_data.get(cuisine, [])
+        return _RESTAURANT_DATA.get(cuisine, ())
     
-    def _get_fallback_restaurants(self, cuisine: str, location: str) -> List[dict]:
+    def _get_fallback_restaurants(self, cuisine: str, location: str) -> List[Restaurant]:
         """Fallback restaurants if search fails"""
-        fallback = {
-            "Thai": {
-                "name": "Local Thai Restaurant",
-                "address": f"Downtown {location}",
-                "phone": "(555) 123-4567",
-                "rating": 4.0,
-                "price_range": "$$",
-                "opentable_url": "https://www.opentable.com"
-            },
-            "Chinese": {
-                "name": "Local Chinese Restaurant", 
-                "address": f"Downtown {location}",
-                "phone": "(555) 234-5678",
-                "rating": 4.0,
-                "price_range": "$$",
-                "opentable_url": "https://www.opentable.com"
-            },
-            "Indian": {
-                "name": "Local Indian Restaurant",
-                "address": f"Downtown {location}",
-                "phone": "(555) 345-6789", 
-                "rating": 4.0,
-                "price_range": "$$",
-                "opentable_url": "https://www.opentable.com"
-            }
-        }
-        
-        return [fallback.get(cuisine, fallback["Thai"])]
+        restaurant = _FALLBACK_RESTAURANTS.get(cuisine, _FALLBACK_RESTAURANTS["Thai"])
+        # Only the address depends on the location; everything else is pre-built
+        return [replace(restaurant, address=f"Downtown {location}")]
     
-    def select_restaurant(self, restaurants: List[dict]) -> dict:
+    def select_restaurant(self, restaurants: Sequence[Restaurant]) -> Restaurant:
         """
         Select a restaurant using the simple rule:
         First viable result that isn't a duplicate from the last run
@@ -163,19 +205,14 @@ class CuisineSelector:
         
         # Try to find a restaurant we haven't used recently
         for restaurant in restaurants:
-            restaurant_key = f"{restaurant['name']}_{restaurant.get('address', '')}"
-            if restaurant_key not in self.used_restaurants:
-                self.used_restaurants.add(restaurant_key)
-                # Keep only the last 10 used restaurants to allow reuse eventually
-                if len(self.used_restaurants) > 10:
-                    # Remove the oldest entry (simplified approach)
-                    self.used_restaurants.pop()
+            if restaurant.key not in self._used_set:
+                # Only the last 10 used restaurants are kept to allow reuse eventually
+                self._mark_used(restaurant.key)
                 return restaurant
         
         # If all restaurants have been used recently, just pick the first one
         restaurant = restaurants[0]
-        restaurant_key = f"{restaurant['name']}_{restaurant.get('address', '')}"
-        self.used_restaurants.add(restaurant_key)
+        self._mark_used(restaurant.key)
         return restaurant
     
     def get_restaurant_recommendation(self, location: str, day: str, time: str, 
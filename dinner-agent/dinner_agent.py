@@ -1,7 +1,12 @@
 import os
 import re
+import atexit
+import logging
 import asyncio
+import threading
+from functools import lru_cache
 from typing import Dict, List, Optional
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables first
@@ -12,18 +17,147 @@ from participant_tracker import ParticipantTracker, DinnerEvent
 from cuisine_selector import CuisineSelector
 from restaurant_booking import RestaurantBooking
 
+logger = logging.getLogger(__name__)
+
+# Agent configuration, read once at import
+INBOX_USERNAME = os.getenv('INBOX_USERNAME')
+MIN_CONFIRMATIONS = int(os.getenv('MIN_CONFIRMATIONS', 4))
+DEFAULT_LOCATION = os.getenv('LOCATION', 'San Francisco')
+
+# Keep-alive pool shared by every AgentMail call (webhook replies and notifications)
+AGENTMAIL_POOL_SIZE = 32
+AGENTMAIL_RETRIES = 3
+# Matches the AgentMail SDK default; a bare httpx.Client would cut it to 5s
+AGENTMAIL_TIMEOUT_SECONDS = 60.0
+
+# Precompiled patterns used to pull details out of email bodies
+# Pattern lists are tried in priority order, not merged into one alternation,
+# because an alternation returns the leftmost match of any pattern
+_NAME_PATTERNS = [
+    re.compile(r'organizer:\s*([^,\n]+)', re.IGNORECASE),
+    re.compile(r'name:\s*([^,\n]+)', re.IGNORECASE),
+    re.compile(r'i\'m\s+([^,\n]+)', re.IGNORECASE),
+]
+_RSVP_NAME_PATTERNS = [
+    re.compile(r'[-–]\s*([^,\n]+)$', re.IGNORECASE | re.MULTILINE),  # Ends with "- Name"
+    re.compile(r'thanks,\s*([^,\n]+)', re.IGNORECASE | re.MULTILINE),
+    re.compile(r'regards,\s*([^,\n]+)', re.IGNORECASE | re.MULTILINE),
+    re.compile(r'best,\s*([^,\n]+)', re.IGNORECASE | re.MULTILINE),
+]
+_PARTY_PATTERNS = [
+    re.compile(r'dinner for (\d+)', re.IGNORECASE),
+    re.compile(r'(\d+) people', re.IGNORECASE),
+    re.compile(r'party of (\d+)', re.IGNORECASE),
+]
+_DAY_PATTERNS = [
+    re.compile(r'preferred.*?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', re.IGNORECASE),
+    re.compile(r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', re.IGNORECASE),
+]
+_DAY_RE = _DAY_PATTERNS[1]
+_PHONE_RE = re.compile(r'[\(]?(\d{3})[\)]?[-.\s]?(\d{3})[-.\s]?(\d{4})')
+_TIME_RE = re.compile(r'(\d{1,2}(?::\d{2})?\s*(?:am|pm))', re.IGNORECASE)
+# Cheap pre-checks: every weekday name ends in "day", every time ends in am/pm
+_DAY_HINT_RE = re.compile(r'day', re.IGNORECASE)
+_TIME_HINT_CHARS = ('m', 'M')
+
+# Keywords used to classify incoming emails (matched against lowercased text)
+NEW_DINNER_KEYWORDS = (
+    'organize dinner', 'plan dinner', 'group dinner', 'team dinner',
+    'book restaurant', 'make reservation', 'dinner for'
+)
+RSVP_KEYWORDS = (
+    'i can make it', 'count me in', 'i\'ll be there', 'yes, i can attend',
+    'i\'m in', 'i can come', 'attending', 'confirmed'
+)
+NEW_DINNER = 'new_dinner'
+RSVP = 'rsvp'
+GENERAL = 'general'
+
+# Every keyword in one pattern; the named group that matched gives its category
+_KEYWORD_RE = re.compile('|'.join(
+    f"(?P<{category}>{'|'.join(map(re.escape, keywords))})"
+    for category, keywords in ((NEW_DINNER, NEW_DINNER_KEYWORDS), (RSVP, RSVP_KEYWORDS))
+))
+
+
+def _classify(combined_lower: str) -> str:
+    """Scan the text once and return NEW_DINNER, RSVP or GENERAL"""
+    category = GENERAL
+    for match in _KEYWORD_RE.finditer(combined_lower):
+        if match.lastgroup == NEW_DINNER:
+            # New dinner requests take priority over RSVPs
+            return NEW_DINNER
+        category = RSVP
+    return category
+
+
+# Reply sent to the organizer once a new dinner event is created
+_NEW_DINNER_RESPONSE = """Thanks for organizing the group dinner, {name}!
+
+I've created a new dinner event and I'm ready to collect RSVPs from your group.
+
+Here are the details I have:
+- Party size: {party_size} people
+- Preferred day: {day}
+- Preferred time: {time}
+- Location: {location}
+
+I'll wait for at least {party_size} people to confirm before booking a restaurant.
+
+Please have your guests email me at {inbox} to confirm their attendance.
+
+Sample RSVP message they can send:
+"{invitation_message}"
+
+I'll automatically:
+1. Collect everyone's RSVPs and preferences
+2. Select a random cuisine (Thai, Chinese, or Indian)
+3. Find and book a suitable restaurant on OpenTable
+4. Send confirmation details to everyone
+
+Let the RSVPs begin! 🍽️"""
+
 
 class DinnerAgent:
     """Main dinner agent that handles email processing and booking coordination"""
     
+    __slots__ = (
+        'agentmail', 'participant_tracker', 'cuisine_selector', 'restaurant_booking',
+        'inbox', 'min_confirmations', 'location', '_loop'
+    )
+    
     def __init__(self):
-        self.agentmail = AgentMail()
+        self.agentmail = AgentMail(httpx_client=httpx.Client(
+            follow_redirects=True,
+            timeout=httpx.Timeout(AGENTMAIL_TIMEOUT_SECONDS),
+            transport=httpx.HTTPTransport(
+                retries=AGENTMAIL_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=AGENTMAIL_POOL_SIZE,
+                    max_keepalive_connections=AGENTMAIL_POOL_SIZE
+                )
+            )
+        ))
         self.participant_tracker = ParticipantTracker()
         self.cuisine_selector = CuisineSelector()
         self.restaurant_booking = RestaurantBooking()
-        self.inbox = f"{os.getenv('INBOX_USERNAME')}@agentmail.to"
-        self.min_confirmations = int(os.getenv('MIN_CONFIRMATIONS', 4))
-        self.location = os.getenv('LOCATION', 'San Francisco')
+        self.inbox = f"{INBOX_USERNAME}@agentmail.to"
+        self.min_confirmations = MIN_CONFIRMATIONS
+        self.location = DEFAULT_LOCATION
+        
+        # One long-lived event loop in a background thread runs all bookings
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        atexit.register(self._shutdown)
+    
+    def _shutdown(self):
+        """Close the shared browser session when the process exits"""
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self.restaurant_booking.close_browser(), self._loop
+            ).result(timeout=10)
+        except Exception as e:
+            logger.error("Error closing browser session: %s", e)
     
     def process_email(self, email_data: Dict) -> str:
         """Process incoming email and determine response"""
@@ -31,37 +165,19 @@ class DinnerAgent:
         subject = email_data["subject"]
         body = email_data["text"]
         
-        print(f"Processing email from: {from_email}")
-        print(f"Subject: {subject}")
-        print(f"Body: {body[:200]}...")
+        logger.debug("Processing email from: %s", from_email)
+        logger.debug("Subject: %s", subject)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Body: %s...", body[:200])
         
-        # Determine if this is a new dinner request or an RSVP
-        if self._is_new_dinner_request(subject, body):
-            return self._handle_new_dinner_request(from_email, subject, body)
-        elif self._is_rsvp_response(subject, body):
-            return self._handle_rsvp_response(from_email, subject, body)
-        else:
-            return self._handle_general_inquiry(from_email, subject, body)
-    
-    def _is_new_dinner_request(self, subject: str, body: str) -> bool:
-        """Check if email is a new dinner planning request"""
-        keywords = [
-            'organize dinner', 'plan dinner', 'group dinner', 'team dinner',
-            'book restaurant', 'make reservation', 'dinner for'
-        ]
-        
-        combined_text = f"{subject} {body}".lower()
-        return any(keyword in combined_text for keyword in keywords)
-    
-    def _is_rsvp_response(self, subject: str, body: str) -> bool:
-        """Check if email is an RSVP response"""
-        rsvp_keywords = [
-            'i can make it', 'count me in', 'i\'ll be there', 'yes, i can attend',
-            'i\'m in', 'i can come', 'attending', 'confirmed'
-        ]
-        
-        combined_text = f"{subject} {body}".lower()
-        return any(keyword in combined_text for keyword in rsvp_keywords)
+        # Determine if this is a new dinner request, an RSVP or something else
+        category = _classify(f"{subject} {body}".lower())
+        handler = {
+            NEW_DINNER: self._handle_new_dinner_request,
+            RSVP: self._handle_rsvp_response,
+            GENERAL: self._handle_general_inquiry,
+        }[category]
+        return handler(from_email, subject, body)
     
     def _handle_new_dinner_request(self, from_email: str, subject: str, body: str) -> str:
         """Handle new dinner planning request"""
@@ -83,38 +199,26 @@ class DinnerAgent:
                 location=dinner_details.get('location', self.location)
             )
             
-            print(f"Created new dinner event: {event_id}")
+            logger.info("Created new dinner event: %s", event_id)
             
             # Generate invitation emails to send to others
-            invitation_message = self._generate_invitation_message(organizer_info, dinner_details)
+            invitation_message = self._generate_invitation_message(
+                dinner_details.get('day', 'this weekend'),
+                dinner_details.get('time', 'evening')
+            )
             
-            return f"""Thanks for organizing the group dinner, {organizer_info['name']}!
-
-I've created a new dinner event and I'm ready to collect RSVPs from your group.
-
-Here are the details I have:
-- Party size: {dinner_details.get('party_size', self.min_confirmations)} people
-- Preferred day: {dinner_details.get('day', 'flexible')}
-- Preferred time: {dinner_details.get('time', 'flexible')}
-- Location: {dinner_details.get('location', self.location)}
-
-I'll wait for at least {dinner_details.get('party_size', self.min_confirmations)} people to confirm before booking a restaurant.
-
-Please have your guests email me at {self.inbox} to confirm their attendance.
-
-Sample RSVP message they can send:
-"{invitation_message}"
-
-I'll automatically:
-1. Collect everyone's RSVPs and preferences
-2. Select a random cuisine (Thai, Chinese, or Indian)
-3. Find and book a suitable restaurant on OpenTable
-4. Send confirmation details to everyone
-
-Let the RSVPs begin! 🍽️"""
+            return _NEW_DINNER_RESPONSE.format(
+                name=organizer_info['name'],
+                party_size=dinner_details.get('party_size', self.min_confirmations),
+                day=dinner_details.get('day', 'flexible'),
+                time=dinner_details.get('time', 'flexible'),
+                location=dinner_details.get('location', self.location),
+                inbox=self.inbox,
+                invitation_message=invitation_message
+            )
             
         except Exception as e:
-            print(f"Error handling dinner request: {e}")
+            logger.error("Error handling dinner request: %s", e)
             return f"""I'd love to help organize your dinner! However, I need a bit more information.
 
 Please include:
@@ -140,19 +244,16 @@ Then I'll coordinate with everyone and make the reservation! 🍽️"""
             # Extract participant information
             participant_info = self._extract_participant_info(from_email, body)
             
-            # Find active dinner events
-            active_events = self.participant_tracker.get_active_events()
+            # For simplicity, add to the most recent active event
+            event_id = self.participant_tracker.get_latest_active_event_id()
             
-            if not active_events:
+            if event_id is None:
                 return """I don't currently have any active dinner events. 
 
 If you're trying to RSVP for a dinner, please ask the organizer to create a new dinner request first.
 
 Thanks! 🍽️"""
             
-            # For simplicity, add to the most recent event
-            event_id = list(active_events.keys())[-1]
-            
             # Add participant confirmation
             success = self.participant_tracker.add_participant_confirmation(
                 event_id=event_id,
@@ -179,16 +280,11 @@ Current RSVPs: {confirmed_count}/{event.min_confirmations} people confirmed
             if self.participant_tracker.is_ready_to_book(event_id):
                 response += "🎉 We have enough confirmations! I'm now booking the restaurant...\n\n"
                 
-                # Trigger booking process in a new thread with its own event loop
-                import threading
-                def run_booking():
-                    try:
-                        asyncio.run(self._book_restaurant_for_event(event_id))
-                    except Exception as e:
-                        print(f"Error in booking thread: {e}")
-                
-                booking_thread = threading.Thread(target=run_booking, daemon=True)
-                booking_thread.start()
+                # Schedule the booking on the shared background event loop
+                future = asyncio.run_coroutine_threadsafe(
+                    self._book_restaurant_for_event(event_id), self._loop
+                )
+                future.add_done_callback(self._log_booking_error)
                 
                 response += "I'll send confirmation details to everyone once the booking is complete!"
             else:
@@ -198,7 +294,7 @@ Current RSVPs: {confirmed_count}/{event.min_confirmations} people confirmed
             return response
             
         except Exception as e:
-            print(f"Error handling RSVP: {e}")
+            logger.error("Error handling RSVP: %s", e)
             return f"""Thanks for your RSVP! I've noted your confirmation.
 
 If you'd like to include specific preferences, you can mention:
@@ -208,6 +304,12 @@ If you'd like to include specific preferences, you can mention:
 
 I'll keep track of everyone's responses and book once we have enough confirmations! 🍽️"""
     
+    @staticmethod
+    def _log_booking_error(future):
+        """Report exceptions raised by a scheduled booking"""
+        if not future.cancelled() and future.exception():
+            logger.error("Error in booking task: %s", future.exception())
+    
     def _handle_general_inquiry(self, from_email: str, subject: str, body: str) -> str:
         """Handle general inquiries about dinner agent"""
         return f"""Hi there! I'm the Dinner Agent 🍽️
@@ -230,14 +332,8 @@ Need help? Just reply with your questions!"""
         info = {'email': from_email, 'name': '', 'phone': ''}
         
         # Extract name
-        name_patterns = [
-            r'organizer:\s*([^,\n]+)',
-            r'name:\s*([^,\n]+)',
-            r'i\'m\s+([^,\n]+)',
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, body, re.IGNORECASE)
+        for pattern in _NAME_PATTERNS:
+            match = pattern.search(body)
             if match:
                 info['name'] = match.group(1).strip()
                 break
@@ -247,8 +343,7 @@ Need help? Just reply with your questions!"""
             info['name'] = from_email.split('@')[0].replace('.', ' ').title()
         
         # Extract phone
-        phone_pattern = r'[\(]?(\d{3})[\)]?[-.\s]?(\d{3})[-.\s]?(\d{4})'
-        phone_match = re.search(phone_pattern, body)
+        phone_match = _PHONE_RE.search(body)
         if phone_match:
             info['phone'] = f"({phone_match.group(1)}) {phone_match.group(2)}-{phone_match.group(3)}"
         
@@ -259,15 +354,8 @@ Need help? Just reply with your questions!"""
         info = {'email': from_email, 'name': ''}
         
         # Extract name (participant might sign their name)
-        name_patterns = [
-            r'[-–]\s*([^,\n]+)$',  # Ends with "- Name"
-            r'thanks,\s*([^,\n]+)',
-            r'regards,\s*([^,\n]+)',
-            r'best,\s*([^,\n]+)',
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, body, re.IGNORECASE | re.MULTILINE)
+        for pattern in _RSVP_NAME_PATTERNS:
+            match = pattern.search(body)
             if match:
                 info['name'] = match.group(1).strip()
                 break
@@ -277,17 +365,16 @@ Need help? Just reply with your questions!"""
             info['name'] = from_email.split('@')[0].replace('.', ' ').title()
         
         # Extract preferences
-        if 'saturday' in body.lower():
-            info['preferred_day'] = 'Saturday'
-        elif 'sunday' in body.lower():
-            info['preferred_day'] = 'Sunday'
-        # Add more day patterns as needed
+        if _DAY_HINT_RE.search(body):
+            day_match = _DAY_RE.search(body)
+            if day_match:
+                info['preferred_day'] = day_match.group(1).title()
         
         # Extract time preferences
-        time_pattern = r'(\d{1,2}(?::\d{2})?\s*(?:am|pm))'
-        time_match = re.search(time_pattern, body, re.IGNORECASE)
-        if time_match:
-            info['preferred_time'] = time_match.group(1)
+        if any(c in body for c in _TIME_HINT_CHARS):
+            time_match = _TIME_RE.search(body)
+            if time_match:
+                info['preferred_time'] = time_match.group(1)
         
         return info
     
@@ -296,43 +383,32 @@ Need help? Just reply with your questions!"""
         details = {}
         
         # Extract party size
-        party_patterns = [
-            r'dinner for (\d+)',
-            r'(\d+) people',
-            r'party of (\d+)',
-        ]
-        
-        for pattern in party_patterns:
-            match = re.search(pattern, body, re.IGNORECASE)
+        for pattern in _PARTY_PATTERNS:
+            match = pattern.search(body)
             if match:
                 details['party_size'] = int(match.group(1))
                 break
         
         # Extract day preference
-        day_patterns = [
-            r'preferred.*?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
-            r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday)',
-        ]
-        
-        for pattern in day_patterns:
-            match = re.search(pattern, body, re.IGNORECASE)
-            if match:
-                details['day'] = match.group(1).title()
-                break
+        if _DAY_HINT_RE.search(body):
+            for pattern in _DAY_PATTERNS:
+                match = pattern.search(body)
+                if match:
+                    details['day'] = match.group(1).title()
+                    break
         
         # Extract time preference
-        time_pattern = r'(\d{1,2}(?::\d{2})?\s*(?:am|pm))'
-        time_match = re.search(time_pattern, body, re.IGNORECASE)
-        if time_match:
-            details['time'] = time_match.group(1)
+        if any(c in body for c in _TIME_HINT_CHARS):
+            time_match = _TIME_RE.search(body)
+            if time_match:
+                details['time'] = time_match.group(1)
         
         return details
     
-    def _generate_invitation_message(self, organizer_info: Dict, dinner_details: Dict) -> str:
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _generate_invitation_message(day: str, time: str) -> str:
         """Generate sample invitation message"""
-        day = dinner_details.get('day', 'this weekend')
-        time = dinner_details.get('time', 'evening')
-        
         return f"Hi! I can make it for dinner {day} around {time}. Looking forward to it! - [Your Name]"
     
     async def _book_restaurant_for_event(self, event_id: str):
@@ -342,7 +418,7 @@ Need help? Just reply with your questions!"""
             if not event or event.booked:
                 return
             
-            print(f"Starting booking process for event {event_id}")
+            logger.info("Starting booking process for event %s", event_id)
             
             # Get common preferences
             preferred_day, preferred_time = self.participant_tracker.get_most_common_preferences(event_id)
@@ -356,7 +432,7 @@ Need help? Just reply with your questions!"""
                 party_size=confirmed_count
             )
             
-            print(f"Selected {cuisine} cuisine, restaurant: {restaurant_info['name']}")
+            logger.info("Selected %s cuisine, restaurant: %s", cuisine, restaurant_info.name)
             
             # Book reservation
             booking_result = await self.restaurant_booking.book_opentable_reservation(
@@ -381,21 +457,33 @@ Need help? Just reply with your questions!"""
                 # Send confirmation emails to all participants
                 await self._send_booking_confirmations(event_id, booking_result, cuisine)
                 
-                print(f"Successfully booked and notified participants for event {event_id}")
+                logger.info("Successfully booked and notified participants for event %s", event_id)
             else:
-                print(f"Booking failed for event {event_id}: {booking_result.get('error')}")
+                logger.warning("Booking failed for event %s: %s", event_id, booking_result.get('error'))
                 await self._send_booking_failure_notification(event_id, booking_result.get('error'))
                 
         except Exception as e:
-            print(f"Error in booking process: {e}")
+            logger.error("Error in booking process: %s", e)
             await self._send_booking_failure_notification(event_id, str(e))
     
+    async def _send_to_participants(self, event_id: str, subject: str, text: str):
+        """Send one message to every confirmed participant, off the event loop.
+        The organizer is addressed directly and everyone else is BCC'd so addresses stay private."""
+        emails = self.participant_tracker.get_all_participant_emails(event_id)
+        if not emails:
+            return
+        await asyncio.to_thread(
+            self.agentmail.inboxes.messages.send,
+            inbox_id=self.inbox,
+            to=emails[0],
+            bcc=emails[1:],
+            subject=subject,
+            text=text
+        )
+    
     async def _send_booking_confirmations(self, event_id: str, booking_result: Dict, cuisine: str):
         """Send booking confirmation emails to all participants"""
         try:
-            event = self.participant_tracker.get_event(event_id)
-            participant_emails = self.participant_tracker.get_all_participant_emails(event_id)
-            
             confirmation_message = f"""🎉 Great news! Your dinner is confirmed!
 
 Restaurant: {booking_result['restaurant_name']} ({cuisine} Cuisine)
@@ -416,23 +504,18 @@ If you need to make any changes, please contact the restaurant directly or reply
 Bon appétit!
 - Dinner Agent"""
             
-            # Send to all participants
-            for email in participant_emails:
-                self.agentmail.inboxes.messages.send(
-                    inbox_id=self.inbox,
-                    to=[email],
-                    subject=f"Dinner Confirmed - {booking_result['restaurant_name']}",
-                    text=confirmation_message
-                )
+            await self._send_to_participants(
+                event_id,
+                subject=f"Dinner Confirmed - {booking_result['restaurant_name']}",
+                text=confirmation_message
+            )
                 
         except Exception as e:
-            print(f"Error sending confirmations: {e}")
+            logger.error("Error sending confirmations: %s", e)
     
     async def _send_booking_failure_notification(self, event_id: str, error_message: str):
         """Send notification when booking fails"""
         try:
-            participant_emails = self.participant_tracker.get_all_participant_emails(event_id)
-            
             failure_message = f"""Sorry, I encountered an issue while booking the restaurant.
 
 Error: {error_message}
@@ -441,13 +524,11 @@ Please try booking manually or contact me with alternative preferences. I'll do
 
 - Dinner Agent"""
             
-            for email in participant_emails:
-                self.agentmail.inboxes.messages.send(
-                    inbox_id=self.inbox,
-                    to=[email],
-                    subject="Dinner Booking Issue - Manual Action Needed",
-                    text=failure_message
-                )
+            await self._send_to_participants(
+                event_id,
+                subject="Dinner Booking Issue - Manual Action Needed",
+                text=failure_message
+            )
                 
         except Exception as e:
-            print(f"Error sending failure notifications: {e}")
+            logger.error("Error sending failure notifications: %s", e)
@@ -0,0 +1,18 @@
+import os
+
+# Gunicorn settings for serving the Quart app: gunicorn -c gunicorn.conf.py main:app
+bind = "127.0.0.1:8080"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Event state, the webhook queue and the ngrok tunnel live in each worker
+# process, so keep a single worker unless state is moved out of process.
+# Concurrency within a worker comes from WEBHOOK_WORKERS instead.
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+
+# On restart the app drains queued webhooks for up to WEBHOOK_DRAIN_TIMEOUT
+# (120s by default) before stopping, so allow a little longer than that
+graceful_timeout = 150
+keepalive = 5
+
+accesslog = "-"
+loglevel = os.getenv("LOG_LEVEL", "INFO").lower()
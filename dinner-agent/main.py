@@ -1,23 +1,63 @@
 import os
+import atexit
 import asyncio
-from threading import Thread
+import logging
+import logging.handlers
+from email.utils import parseaddr
+from queue import SimpleQueue
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from dotenv import load_dotenv
 
 import ngrok
-from flask import Flask, request, Response
+import orjson
+import uvicorn
+from quart import Quart, request, Response
+from quart.json.provider import DefaultJSONProvider
 
 from dinner_agent import DinnerAgent
 
 load_dotenv()
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+
+# Records are still formatted by the caller (QueueHandler.prepare), but writing
+# them out happens on a background thread, keeping handler I/O off the webhook path
+root_logger = logging.getLogger()
+log_queue = SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, *root_logger.handlers)
+root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger = logging.getLogger("dinner_agent")
+
 # Configuration
 port = 8080
 domain = os.getenv("WEBHOOK_DOMAIN")
 inbox = f"{os.getenv('INBOX_USERNAME')}@agentmail.to"
+webhook_workers = int(os.getenv("WEBHOOK_WORKERS", 4))
+webhook_queue_size = int(os.getenv("WEBHOOK_QUEUE_SIZE", 256))
+webhook_drain_timeout = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 120))
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for webhook bodies and API responses"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 # Initialize services
 listener = ngrok.forward(port, domain=domain, authtoken_from_env=True)
-app = Flask(__name__)
+app = Quart(__name__)
+app.json = OrjsonProvider(app)
 dinner_agent = DinnerAgent()
 
 print(f"""
@@ -32,47 +72,92 @@ Ready to organize group dinners!
 """)
 
 
+# Bounded queue of webhook payloads drained by a fixed set of worker tasks
+job_queue = asyncio.Queue(maxsize=webhook_queue_size)
+worker_tasks = []
+
+# Blocking agent and AgentMail calls run on a pool sized to the worker count
+EXECUTOR = ThreadPoolExecutor(max_workers=webhook_workers, thread_name_prefix="wh")
+atexit.register(EXECUTOR.shutdown, wait=True)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the webhook thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, partial(func, *args, **kwargs))
+
+
+@app.before_serving
+async def start_workers():
+    """Start the long-lived webhook workers"""
+    for _ in range(webhook_workers):
+        worker_tasks.append(asyncio.create_task(worker_loop()))
+
+
+@app.after_serving
+async def stop_workers():
+    """Finish queued webhooks, then cancel the workers on shutdown.
+    Payloads were already acknowledged, so AgentMail will not redeliver anything dropped here."""
+    try:
+        await asyncio.wait_for(job_queue.join(), timeout=webhook_drain_timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Shutting down with %d webhooks still queued", job_queue.qsize())
+    for task in worker_tasks:
+        task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+
+
+async def worker_loop():
+    """Process queued webhook payloads one at a time"""
+    while True:
+        payload = await job_queue.get()
+        try:
+            await process_webhook(payload)
+        finally:
+            job_queue.task_done()
+
+
 @app.route("/webhooks", methods=["POST"])
-def receive_webhook():
-    """Receive AgentMail webhook and process email"""
-    Thread(target=process_webhook, args=(request.json,)).start()
+async def receive_webhook():
+    """Receive AgentMail webhook and queue the email for processing"""
+    try:
+        job_queue.put_nowait(await request.get_json(cache=False))
+    except asyncio.QueueFull:
+        # Tell AgentMail to retry later instead of buffering without limit
+        return Response(status=503)
     return Response(status=200)
 
 
-def process_webhook(payload):
+async def process_webhook(payload):
     """Process incoming email webhook"""
     try:
         email = payload["message"]
         
-        prompt = f"""
-From: {email["from"]}
-Subject: {email["subject"]}
-Body:
-{email["text"]}
-"""
-        print(f"\n📧 New Email Received:")
-        print(f"From: {email['from']}")
-        print(f"Subject: {email['subject']}")
-        print("-" * 50)
+        # Ignore our own notifications coming back in, or the agent would answer itself
+        if parseaddr(email["from"])[1].lower() == inbox.lower():
+            logger.debug("Skipping email sent from own inbox: %s", email["subject"])
+            return
+        
+        logger.info("New email from %s: %s", email["from"], email["subject"])
         
         # Process email with dinner agent
-        response = dinner_agent.process_email(email)
+        response = await run_blocking(dinner_agent.process_email, email)
         
-        print(f"\n🤖 Agent Response:")
-        print(response)
-        print("-" * 50)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Agent response:\n%s", response)
         
         # Send reply
-        print(f"📤 Sending reply to {email['from']}...")
-        dinner_agent.agentmail.inboxes.messages.reply(
+        logger.info("Sending reply to %s", email["from"])
+        await run_blocking(
+            dinner_agent.agentmail.inboxes.messages.reply,
             inbox_id=inbox,
             message_id=email["message_id"],
             text=response
         )
-        print("✅ Reply sent successfully\n")
+        logger.info("Reply sent to %s", email["from"])
         
     except Exception as e:
-        print(f"❌ Error processing webhook: {e}")
+        logger.error("Error processing webhook: %s", e)
         
         # Send error response
         try:
@@ -82,54 +167,41 @@ Please try again or contact support if the issue persists.
 
 - Dinner Agent 🍽️"""
             
-            dinner_agent.agentmail.inboxes.messages.reply(
+            await run_blocking(
+                dinner_agent.agentmail.inboxes.messages.reply,
                 inbox_id=inbox,
                 message_id=email["message_id"],
                 text=error_message
             )
         except Exception as reply_error:
-            print(f"Failed to send error reply: {reply_error}")
+            logger.error("Failed to send error reply: %s", reply_error)
 
 
 @app.route("/health", methods=["GET"])
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "service": "dinner-agent",
         "inbox": inbox,
-        "active_events": len(dinner_agent.participant_tracker.get_active_events())
+        "active_events": dinner_agent.participant_tracker.get_active_event_count()
     }
 
 
 @app.route("/status", methods=["GET"])  
-def status():
+async def status():
     """Get current dinner agent status"""
     try:
-        active_events = dinner_agent.participant_tracker.get_active_events()
+        events = dinner_agent.participant_tracker.get_active_event_summaries()
         
-        status_info = {
+        return {
             "inbox": inbox,
-            "active_events": len(active_events),
+            "active_events": len(events),
             "min_confirmations": dinner_agent.min_confirmations,
             "location": dinner_agent.location,
-            "events": []
+            "events": events
         }
         
-        # Add event details
-        for event_id, event in active_events.items():
-            confirmed_count = dinner_agent.participant_tracker.get_confirmed_count(event_id)
-            status_info["events"].append({
-                "event_id": event_id,
-                "organizer": event.organizer.name,
-                "confirmed_count": confirmed_count,
-                "min_required": event.min_confirmations,
-                "ready_to_book": confirmed_count >= event.min_confirmations,
-                "created_at": event.created_at
-            })
-        
-        return status_info
-        
     except Exception as e:
         return {"error": str(e)}, 500
 
@@ -142,4 +214,4 @@ if __name__ == "__main__":
     print(f"❤️  Health URL: https://{domain}/health")
     print("\n" + "="*60)
     
-    app.run(port=port, debug=False)
+    uvicorn.run(app, port=port, workers=1, loop="auto")
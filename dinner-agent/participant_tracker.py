@@ -1,11 +1,21 @@
-import json
 import os
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+import time
+import logging
+import sqlite3
+import atexit
+import threading
+from collections import Counter
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 
+import orjson
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
 class Participant:
     name: str
     email: str
@@ -16,7 +26,7 @@ class Participant:
     confirmed_at: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class DinnerEvent:
     organizer: Participant
     participants: List[Participant]
@@ -28,140 +38,232 @@ class DinnerEvent:
     booking_url: Optional[str] = None
     booked: bool = False
     created_at: str = None
+    # Derived from organizer + confirmed participants; not persisted
+    confirmed_emails: List[str] = field(default_factory=list, init=False, repr=False)
+    # Participants keyed by lowercased email; not persisted
+    participants_by_email: Dict[str, Participant] = field(default_factory=dict, init=False, repr=False)
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.now().isoformat()
+        self.participants_by_email = {p.email.lower(): p for p in self.participants}
+        self.confirmed_emails = [self.organizer.email]
+        self.confirmed_emails.extend(p.email for p in self.participants if p.confirmed)
+    
+    @property
+    def confirmed_count(self) -> int:
+        """Organizer plus confirmed participants, kept current by confirmed_emails"""
+        return len(self.confirmed_emails)
+
+
+# Fields written to storage; the derived lookups are rebuilt on load
+_PERSISTED_FIELDS = tuple(
+    f.name for f in fields(DinnerEvent) if f.name not in ('confirmed_emails', 'participants_by_email')
+)
+
+# Coalesce bursts of changes into at most one write per window
+SAVE_DEBOUNCE_SECONDS = 0.5
+
+# JSON file used before events moved to SQLite; imported once into an empty database
+LEGACY_DATA_FILE = "dinner_events.json"
+
+
+def _event_from_dict(event_data: Dict) -> DinnerEvent:
+    """Rebuild a DinnerEvent from its stored dict form"""
+    # Convert participant dicts back to Participant objects
+    organizer = Participant(**event_data['organizer'])
+    participants = [Participant(**p) for p in event_data['participants']]
+    
+    return DinnerEvent(
+        organizer=organizer,
+        participants=participants,
+        min_confirmations=event_data['min_confirmations'],
+        location=event_data.get('location', 'San Francisco'),
+        cuisine=event_data.get('cuisine'),
+        restaurant_name=event_data.get('restaurant_name'),
+        booking_confirmation=event_data.get('booking_confirmation'),
+        booking_url=event_data.get('booking_url'),
+        booked=event_data.get('booked', False),
+        created_at=event_data.get('created_at')
+    )
 
 
 class ParticipantTracker:
-    def __init__(self, data_file: str = "dinner_events.json"):
+    def __init__(self, data_file: str = "dinner_events.db"):
         self.data_file = data_file
         self.events: Dict[str, DinnerEvent] = {}
+        self._lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._dirty_events = set()
+        self._write_lock = threading.Lock()
+        self._db = sqlite3.connect(data_file, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events (event_id TEXT PRIMARY KEY, data BLOB NOT NULL)"
+        )
         self.load_data()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+        atexit.register(self.flush)
     
     def load_data(self):
-        """Load existing dinner events from JSON file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    data = json.load(f)
-                    for event_id, event_data in data.items():
-                        # Convert participant dicts back to Participant objects
-                        organizer = Participant(**event_data['organizer'])
-                        participants = [Participant(**p) for p in event_data['participants']]
-                        
-                        event = DinnerEvent(
-                            organizer=organizer,
-                            participants=participants,
-                            min_confirmations=event_data['min_confirmations'],
-                            location=event_data.get('location', 'San Francisco'),
-                            cuisine=event_data.get('cuisine'),
-                            restaurant_name=event_data.get('restaurant_name'),
-                            booking_confirmation=event_data.get('booking_confirmation'),
-                            booking_url=event_data.get('booking_url'),
-                            booked=event_data.get('booked', False),
-                            created_at=event_data.get('created_at')
-                        )
-                        self.events[event_id] = event
-            except Exception as e:
-                print(f"Error loading data: {e}")
-    
-    def save_data(self):
-        """Save dinner events to JSON file"""
+        """Load existing dinner events from the database"""
         try:
-            data = {}
-            for event_id, event in self.events.items():
-                event_dict = asdict(event)
-                data[event_id] = event_dict
-            
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            rows = self._db.execute("SELECT event_id, data FROM events ORDER BY rowid").fetchall()
+            for event_id, data in rows:
+                self.events[event_id] = _event_from_dict(orjson.loads(data))
+        except Exception as e:
+            logger.error("Error loading data: %s", e)
+            return
+        
+        if not rows:
+            self._import_legacy_data()
+    
+    def _import_legacy_data(self):
+        """One-time import of events saved by the JSON-file version of the tracker"""
+        legacy_file = os.path.join(os.path.dirname(self.data_file), LEGACY_DATA_FILE)
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'rb') as f:
+                data = orjson.loads(f.read())
+            for event_id, event_data in data.items():
+                self.events[event_id] = _event_from_dict(event_data)
+        except Exception as e:
+            logger.error("Error importing %s: %s", legacy_file, e)
+            self.events.clear()
+            return
+        
+        self.save_data()
+        logger.info("Imported %d events from %s", len(self.events), legacy_file)
+    
+    def save_data(self, event_ids: Optional[Iterable[str]] = None):
+        """Save the given dinner events (all of them by default), one row per event"""
+        try:
+            # Serialize writers so an older snapshot never overwrites a newer one
+            with self._write_lock:
+                with self._lock:
+                    if event_ids is None:
+                        event_ids = list(self.events)
+                    rows = []
+                    for event_id in event_ids:
+                        # orjson walks the Participant dataclasses directly, no deep copy
+                        event = self.events[event_id]
+                        event_dict = {name: getattr(event, name) for name in _PERSISTED_FIELDS}
+                        rows.append((event_id, orjson.dumps(event_dict)))
+                
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO events (event_id, data) VALUES (?, ?) "
+                        "ON CONFLICT(event_id) DO UPDATE SET data = excluded.data",
+                        rows
+                    )
         except Exception as e:
-            print(f"Error saving data: {e}")
+            logger.error("Error saving data: %s", e)
+    
+    def _schedule_save(self, event_id: str):
+        """Mark an event as changed; the flush thread writes it shortly after"""
+        self._dirty_events.add(event_id)
+        self._dirty.set()
+    
+    def _flush_loop(self):
+        """Background writer that coalesces changes into periodic saves"""
+        while True:
+            self._dirty.wait()
+            time.sleep(SAVE_DEBOUNCE_SECONDS)
+            self.flush()
+    
+    def flush(self):
+        """Write any pending changes immediately"""
+        with self._lock:
+            self._dirty.clear()
+            event_ids, self._dirty_events = self._dirty_events, set()
+        if event_ids:
+            self.save_data(event_ids)
     
     def create_dinner_event(self, organizer_email: str, organizer_name: str, 
                           organizer_phone: str, min_confirmations: int,
                           preferred_day: str = None, preferred_time: str = None,
                           location: str = "San Francisco") -> str:
         """Create a new dinner event"""
-        organizer = Participant(
-            name=organizer_name,
-            email=organizer_email,
-            phone=organizer_phone,
-            confirmed=True,
-            preferred_day=preferred_day,
-            preferred_time=preferred_time,
-            confirmed_at=datetime.now().isoformat()
-        )
-        
-        event = DinnerEvent(
-            organizer=organizer,
-            participants=[],
-            min_confirmations=min_confirmations,
-            location=location
-        )
-        
-        event_id = f"dinner_{len(self.events) + 1}_{int(datetime.now().timestamp())}"
-        self.events[event_id] = event
-        self.save_data()
-        return event_id
+        with self._lock:
+            organizer = Participant(
+                name=organizer_name,
+                email=organizer_email,
+                phone=organizer_phone,
+                confirmed=True,
+                preferred_day=preferred_day,
+                preferred_time=preferred_time,
+                confirmed_at=datetime.now().isoformat()
+            )
+            
+            event = DinnerEvent(
+                organizer=organizer,
+                participants=[],
+                min_confirmations=min_confirmations,
+                location=location
+            )
+            
+            event_id = f"dinner_{len(self.events) + 1}_{int(datetime.now().timestamp())}"
+            self.events[event_id] = event
+            self._schedule_save(event_id)
+            return event_id
     
     def add_participant_confirmation(self, event_id: str, participant_email: str,
                                    participant_name: str, participant_phone: str = "",
                                    preferred_day: str = None, preferred_time: str = None) -> bool:
         """Add or update a participant's confirmation"""
-        if event_id not in self.events:
-            return False
-        
-        event = self.events[event_id]
-        
-        # Check if participant already exists
-        for i, participant in enumerate(event.participants):
-            if participant.email.lower() == participant_email.lower():
+        with self._lock:
+            if event_id not in self.events:
+                return False
+            
+            event = self.events[event_id]
+            
+            # Check if participant already exists
+            email_key = participant_email.lower()
+            participant = event.participants_by_email.get(email_key)
+            if participant:
                 # Update existing participant
-                event.participants[i].confirmed = True
-                event.participants[i].confirmed_at = datetime.now().isoformat()
+                if not participant.confirmed:
+                    event.confirmed_emails.append(participant.email)
+                participant.confirmed = True
+                participant.confirmed_at = datetime.now().isoformat()
                 if preferred_day:
-                    event.participants[i].preferred_day = preferred_day
+                    participant.preferred_day = preferred_day
                 if preferred_time:
-                    event.participants[i].preferred_time = preferred_time
-                self.save_data()
+                    participant.preferred_time = preferred_time
+                self._schedule_save(event_id)
                 return True
-        
-        # Add new participant
-        participant = Participant(
-            name=participant_name,
-            email=participant_email,
-            phone=participant_phone,
-            confirmed=True,
-            preferred_day=preferred_day,
-            preferred_time=preferred_time,
-            confirmed_at=datetime.now().isoformat()
-        )
-        
-        event.participants.append(participant)
-        self.save_data()
-        return True
+            
+            # Add new participant
+            participant = Participant(
+                name=participant_name,
+                email=participant_email,
+                phone=participant_phone,
+                confirmed=True,
+                preferred_day=preferred_day,
+                preferred_time=preferred_time,
+                confirmed_at=datetime.now().isoformat()
+            )
+            
+            event.participants.append(participant)
+            event.participants_by_email[email_key] = participant
+            event.confirmed_emails.append(participant_email)
+            self._schedule_save(event_id)
+            return True
     
     def get_confirmed_count(self, event_id: str) -> int:
         """Get count of confirmed participants for an event"""
         if event_id not in self.events:
             return 0
         
-        event = self.events[event_id]
-        confirmed_count = 1  # Organizer is always confirmed
-        confirmed_count += sum(1 for p in event.participants if p.confirmed)
-        return confirmed_count
+        return self.events[event_id].confirmed_count
     
     def is_ready_to_book(self, event_id: str) -> bool:
         """Check if event has enough confirmations to book"""
-        if event_id not in self.events:
-            return False
-        
-        event = self.events[event_id]
-        return (not event.booked and 
-                self.get_confirmed_count(event_id) >= event.min_confirmations)
+        event = self.events.get(event_id)
+        return (event is not None and not event.booked and
+                event.confirmed_count >= event.min_confirmations)
     
     def get_most_common_preferences(self, event_id: str) -> tuple:
         """Get the most common day and time preferences"""
@@ -169,52 +271,77 @@ class ParticipantTracker:
             return None, None
         
         event = self.events[event_id]
-        all_participants = [event.organizer] + [p for p in event.participants if p.confirmed]
         
-        # Count day preferences
-        day_counts = {}
-        time_counts = {}
+        # Count day and time preferences
+        day_counts = Counter()
+        time_counts = Counter()
         
-        for participant in all_participants:
+        for participant in chain((event.organizer,), (p for p in event.participants if p.confirmed)):
             if participant.preferred_day:
-                day_counts[participant.preferred_day] = day_counts.get(participant.preferred_day, 0) + 1
+                day_counts[participant.preferred_day] += 1
             if participant.preferred_time:
-                time_counts[participant.preferred_time] = time_counts.get(participant.preferred_time, 0) + 1
+                time_counts[participant.preferred_time] += 1
         
-        most_common_day = max(day_counts.items(), key=lambda x: x[1])[0] if day_counts else None
-        most_common_time = max(time_counts.items(), key=lambda x: x[1])[0] if time_counts else None
+        most_common_day = day_counts.most_common(1)[0][0] if day_counts else None
+        most_common_time = time_counts.most_common(1)[0][0] if time_counts else None
         
         return most_common_day, most_common_time
     
     def mark_as_booked(self, event_id: str, restaurant_name: str, 
                       confirmation_code: str, booking_url: str, cuisine: str):
         """Mark event as booked with details"""
-        if event_id not in self.events:
-            return False
-        
-        event = self.events[event_id]
-        event.booked = True
-        event.restaurant_name = restaurant_name
-        event.booking_confirmation = confirmation_code
-        event.booking_url = booking_url
-        event.cuisine = cuisine
-        self.save_data()
-        return True
+        with self._lock:
+            if event_id not in self.events:
+                return False
+            
+            event = self.events[event_id]
+            event.booked = True
+            event.restaurant_name = restaurant_name
+            event.booking_confirmation = confirmation_code
+            event.booking_url = booking_url
+            event.cuisine = cuisine
+            self._schedule_save(event_id)
+            return True
     
     def get_all_participant_emails(self, event_id: str) -> List[str]:
         """Get all participant emails for an event"""
-        if event_id not in self.events:
-            return []
-        
-        event = self.events[event_id]
-        emails = [event.organizer.email]
-        emails.extend([p.email for p in event.participants if p.confirmed])
-        return emails
+        with self._lock:
+            if event_id not in self.events:
+                return []
+            
+            # Copy so callers never share the list confirmed_count is derived from
+            return list(self.events[event_id].confirmed_emails)
     
     def get_event(self, event_id: str) -> Optional[DinnerEvent]:
         """Get event by ID"""
         return self.events.get(event_id)
     
+    def get_latest_active_event_id(self) -> Optional[str]:
+        """Get the most recently created event that is not yet booked"""
+        with self._lock:
+            return next((k for k in reversed(self.events) if not self.events[k].booked), None)
+    
     def get_active_events(self) -> Dict[str, DinnerEvent]:
         """Get all events that are not yet booked"""
-        return {k: v for k, v in self.events.items() if not v.booked}
+        with self._lock:
+            return {k: v for k, v in self.events.items() if not v.booked}
+    
+    def get_active_event_count(self) -> int:
+        """Count events that are not yet booked"""
+        with self._lock:
+            return sum(1 for event in self.events.values() if not event.booked)
+    
+    def get_active_event_summaries(self) -> List[Dict]:
+        """Summarize unbooked events for status reporting"""
+        with self._lock:
+            return [
+                {
+                    "event_id": event_id,
+                    "organizer": event.organizer.name,
+                    "confirmed_count": event.confirmed_count,
+                    "min_required": event.min_confirmations,
+                    "ready_to_book": event.confirmed_count >= event.min_confirmations,
+                    "created_at": event.created_at
+                }
+                for event_id, event in self.events.items() if not event.booked
+            ]
@@ -1,21 +1,50 @@
 import os
+import re
 import asyncio
-from datetime import datetime, timedelta
+import logging
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Dict
 from dotenv import load_dotenv
 
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from stagehand import Stagehand, StagehandConfig
 
+from cuisine_selector import Restaurant
+
 # Load environment variables and set MODEL_API_KEY
 load_dotenv()
 os.environ['MODEL_API_KEY'] = os.getenv('OPENAI_API_KEY')
 
+logger = logging.getLogger(__name__)
+
+# Hard ceiling for a whole booking flow
+BOOKING_TIMEOUT_SECONDS = 120
+# Limits for checking a reused session and cleaning it up after a booking
+SESSION_PROBE_TIMEOUT_SECONDS = 10
+SESSION_RESET_TIMEOUT_SECONDS = 10
+
+# Confirmation screenshots are opt-in; they are taken off the critical path
+SAVE_BOOKING_SCREENSHOTS = os.getenv("SAVE_BOOKING_SCREENSHOTS") == "1"
+
+# Lookups used when normalizing dates and times for OpenTable
+_WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+_FALLBACK_TIME = "7:00 PM"
+_TIME_24H_RE = re.compile(r'^(\d{1,2}):(\d{2})$')
+
 
 class RestaurantBooking:
     """Handles OpenTable reservation booking using Stagehand"""
     
     def __init__(self):
         self.stagehand = None
+        # The browser session is shared, so only one booking may drive it at a time
+        self._browser_lock = asyncio.Lock()
+        # In-flight confirmation screenshots, finished before the page is reused
+        self._screenshot_tasks = set()
         self.config = StagehandConfig(
             env="BROWSERBASE",
             api_key=os.getenv("BROWSERBASE_API_KEY"),
@@ -24,33 +53,116 @@ class RestaurantBooking:
             model_client_options={"apiKey": os.getenv("MODEL_API_KEY")}
         )
     
-    async def init_browser(self):
-        """Initialize the Stagehand browser session"""
+    async def ensure_browser(self):
+        """Reuse the Stagehand browser session, creating it on first use.
+        Callers must hold self._browser_lock."""
+        await self._drain_screenshots()
+        if self.stagehand is not None:
+            if await self._session_alive():
+                return True
+            await self.close_browser()
         try:
-            self.stagehand = Stagehand(
+            stagehand = Stagehand(
                 config=self.config,
                 server_url=os.getenv("STAGEHAND_API_URL")
             )
-            await self.stagehand.init()
-            print(f"Browser session created: {self.stagehand.session_id}")
+            await stagehand.init()
+            self.stagehand = stagehand
+            logger.info("Browser session created: %s", self.stagehand.session_id)
+            return True
+        except Exception as e:
+            logger.error("Error initializing browser: %s", e)
+            return False
+    
+    async def _session_alive(self) -> bool:
+        """Probe the reused session, which Browserbase may have expired since the last booking"""
+        try:
+            async with asyncio.timeout(SESSION_PROBE_TIMEOUT_SECONDS):
+                await self.stagehand.page.evaluate("1")
             return True
         except Exception as e:
-            print(f"Error initializing browser: {e}")
+            logger.info("Browser session is no longer usable, starting a new one: %s", e)
             return False
     
+    async def reset_browser(self):
+        """Clear per-booking state so the next booking starts from a clean session.
+        Never raises; a session that cannot be reset is closed instead."""
+        if self.stagehand is None:
+            return
+        try:
+            async with asyncio.timeout(SESSION_RESET_TIMEOUT_SECONDS):
+                await self.stagehand.page.context.clear_cookies()
+        except Exception as e:
+            logger.warning("Error resetting browser session, closing it: %s", e)
+            await self.close_browser()
+    
+    async def _wait_for_page(self, page, timeout: float):
+        """Wait until the page stops loading, giving up after `timeout` seconds"""
+        try:
+            await page.wait_for_load_state("networkidle", timeout=timeout * 1000)
+        except PlaywrightTimeoutError:
+            pass
+    
+    def _start_screenshot(self, page) -> str:
+        """Capture the confirmation page in the background and return its path"""
+        screenshot_path = f"booking_confirmation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+        task = asyncio.create_task(
+            page.screenshot(path=screenshot_path, full_page=False, type="jpeg", quality=70)
+        )
+        self._screenshot_tasks.add(task)
+        task.add_done_callback(self._screenshot_tasks.discard)
+        return screenshot_path
+    
+    async def _drain_screenshots(self):
+        """Wait for pending screenshots so they capture the page they were taken for"""
+        if self._screenshot_tasks:
+            results = await asyncio.gather(*self._screenshot_tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("Error saving booking screenshot: %s", result)
+    
     async def close_browser(self):
-        """Close the browser session"""
+        """Close the browser session; the next booking will start a new one"""
+        await self._drain_screenshots()
         if self.stagehand:
-            await self.stagehand.close()
+            stagehand, self.stagehand = self.stagehand, None
+            try:
+                await stagehand.close()
+            except Exception as e:
+                logger.error("Error closing browser session: %s", e)
     
-    async def book_opentable_reservation(self, restaurant_info: Dict, party_size: int,
+    async def book_opentable_reservation(self, restaurant_info: Restaurant, party_size: int,
                                        date: str, time: str, organizer_name: str,
                                        organizer_email: str) -> Dict:
         """
         Book a reservation on OpenTable
         Returns booking confirmation details
         """
-        if not await self.init_browser():
+        async with self._browser_lock:
+            try:
+                async with asyncio.timeout(BOOKING_TIMEOUT_SECONDS):
+                    result = await self._book_opentable_reservation(
+                        restaurant_info, party_size, date, time, organizer_name, organizer_email
+                    )
+            except TimeoutError:
+                logger.warning("Booking timed out after %ss", BOOKING_TIMEOUT_SECONDS)
+                await self.close_browser()
+                return {
+                    "success": False,
+                    "error": "Booking timed out",
+                    "restaurant_name": restaurant_info.name
+                }
+            
+            # Cleanup runs after the booking is complete, so it cannot turn it into a failure
+            if result["success"]:
+                await self.reset_browser()
+            return result
+    
+    async def _book_opentable_reservation(self, restaurant_info: Restaurant, party_size: int,
+                                        date: str, time: str, organizer_name: str,
+                                        organizer_email: str) -> Dict:
+        """Drive the OpenTable booking flow on the shared browser session"""
+        if not await self.ensure_browser():
             return {"success": False, "error": "Failed to initialize browser"}
         
         try:
@@ -58,55 +170,55 @@ class RestaurantBooking:
             
             # Navigate to OpenTable
             await page.goto("https://www.opentable.com")
-            await asyncio.sleep(2)
+            await self._wait_for_page(page, 2)
             
             # Search for the restaurant
-            restaurant_name = restaurant_info.get("name", "")
+            restaurant_name = restaurant_info.name
             
             # Use the search functionality
             await page.act(f"search for {restaurant_name}")
-            await asyncio.sleep(3)
+            await self._wait_for_page(page, 3)
             
             # Click on the restaurant from search results
             await page.act(f"click on {restaurant_name} in the search results")
-            await asyncio.sleep(3)
+            await self._wait_for_page(page, 3)
             
             # Look for reservation booking section
             await page.act("find the reservation booking section")
-            await asyncio.sleep(2)
+            await self._wait_for_page(page, 2)
             
             # Set party size
             await page.act(f"set party size to {party_size} people")
-            await asyncio.sleep(1)
+            await self._wait_for_page(page, 1)
             
             # Set date - convert date string to proper format
             formatted_date = self._format_date_for_opentable(date)
             await page.act(f"select date {formatted_date}")
-            await asyncio.sleep(1)
+            await self._wait_for_page(page, 1)
             
             # Set time
             formatted_time = self._format_time_for_opentable(time)
             await page.act(f"select time {formatted_time}")
-            await asyncio.sleep(1)
+            await self._wait_for_page(page, 1)
             
             # Click find table or search button
             await page.act("click find table or search for available times")
-            await asyncio.sleep(5)
+            await self._wait_for_page(page, 5)
             
             # Select the first available time slot
             await page.act("select the first available time slot")
-            await asyncio.sleep(3)
+            await self._wait_for_page(page, 3)
             
             # Fill in reservation details
             await page.act(f"enter name as {organizer_name}")
-            await asyncio.sleep(1)
+            await self._wait_for_page(page, 1)
             
             await page.act(f"enter email as {organizer_email}")
-            await asyncio.sleep(1)
+            await self._wait_for_page(page, 1)
             
             # Submit the reservation
             await page.act("submit the reservation or complete booking")
-            await asyncio.sleep(5)
+            await self._wait_for_page(page, 5)
             
             # Extract confirmation details
             confirmation_data = await page.extract(
@@ -121,11 +233,8 @@ class RestaurantBooking:
                 }
             )
             
-            # Take a screenshot for confirmation
-            screenshot_path = f"booking_confirmation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            await page.screenshot(path=screenshot_path)
-            
-            await self.close_browser()
+            # Optionally keep a screenshot for confirmation without waiting on it
+            screenshot_path = self._start_screenshot(page) if SAVE_BOOKING_SCREENSHOTS else None
             
             return {
                 "success": True,
@@ -139,28 +248,30 @@ class RestaurantBooking:
             }
             
         except Exception as e:
-            print(f"Error during booking: {e}")
+            logger.error("Error during booking: %s", e)
+            # The session may be in a bad state; drop it and start fresh next time
             await self.close_browser()
             return {
                 "success": False,
                 "error": str(e),
-                "restaurant_name": restaurant_info.get("name", "Unknown")
+                "restaurant_name": restaurant_info.name
             }
     
     def _format_date_for_opentable(self, date_str: str) -> str:
         """Format date string for OpenTable (e.g., 'Saturday' -> specific date)"""
+        # The result depends on today's date, so it is part of the cache key
+        return self._format_date_from(date_str, date.today())
+    
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _format_date_from(date_str: str, today: date) -> str:
+        """Resolve a day name to the next matching date after `today`"""
         try:
             # Handle day names like "Saturday", "Sunday", etc.
-            days = {
-                'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-                'friday': 4, 'saturday': 5, 'sunday': 6
-            }
-            
             date_lower = date_str.lower()
-            if date_lower in days:
+            if date_lower in _WEEKDAYS:
                 # Find the next occurrence of this day
-                today = datetime.now()
-                days_ahead = days[date_lower] - today.weekday()
+                days_ahead = _WEEKDAYS[date_lower] - today.weekday()
                 if days_ahead <= 0:  # Target day already happened this week
                     days_ahead += 7
                 target_date = today + timedelta(days=days_ahead)
@@ -171,10 +282,12 @@ class RestaurantBooking:
             
         except Exception:
             # Fallback to tomorrow
-            tomorrow = datetime.now() + timedelta(days=1)
+            tomorrow = today + timedelta(days=1)
             return tomorrow.strftime("%B %d, %Y")
     
-    def _format_time_for_opentable(self, time_str: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _format_time_for_opentable(time_str: str) -> str:
         """Format time string for OpenTable"""
         try:
             # Handle various time formats
@@ -185,8 +298,9 @@ class RestaurantBooking:
                 return time_str
             
             # Handle 24-hour format
-            if ':' in time_str and len(time_str.split(':')[0]) <= 2:
-                hour, minute = time_str.split(':')
+            match = _TIME_24H_RE.match(time_str)
+            if match:
+                hour, minute = match.group(1, 2)
                 hour = int(hour)
                 if hour >= 12:
                     if hour > 12:
@@ -198,35 +312,40 @@ class RestaurantBooking:
                     return f"{hour}:{minute} AM"
             
             # Default fallback
-            return "7:00 PM"
+            return _FALLBACK_TIME
             
         except Exception:
-            return "7:00 PM"
+            return _FALLBACK_TIME
     
     async def verify_booking(self, confirmation_url: str) -> bool:
         """Verify booking by checking confirmation URL"""
         if not confirmation_url:
             return False
         
+        async with self._browser_lock:
+            return await self._verify_booking(confirmation_url)
+    
+    async def _verify_booking(self, confirmation_url: str) -> bool:
+        """Check the confirmation page on the shared browser session"""
         try:
-            if not await self.init_browser():
+            if not await self.ensure_browser():
                 return False
             
             page = self.stagehand.page
             await page.goto(confirmation_url)
-            await asyncio.sleep(3)
+            await self._wait_for_page(page, 3)
             
             # Check if the page contains confirmation details
             booking_status = await page.extract(
                 instruction="check if this page shows a confirmed reservation",
                 schema={"is_confirmed": "boolean", "status": "string"}
             )
-            
-            await self.close_browser()
-            return booking_status.get("is_confirmed", False)
+            is_confirmed = booking_status.get("is_confirmed", False)
             
         except Exception as e:
-            print(f"Error verifying booking: {e}")
-            if self.stagehand:
-                await self.close_browser()
+            logger.error("Error verifying booking: %s", e)
+            await self.close_browser()
             return False
+        
+        await self.reset_browser()
+        return is_confirmed
@@ -6,19 +6,25 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+import atexit
 import asyncio
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, BoundedSemaphore, Lock, local
 import json
-import time 
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import count
 
+import httpx
 import ngrok
 from flask import Flask, request, Response
+from waitress import serve
 
 from agentmail import AgentMail
 from agentmail_toolkit.openai import AgentMailToolkit
 from agents import WebSearchTool, Agent, Runner
-from utils import extract_github_info, is_question, extract_sender_name, detect_duplicate_issue, group_duplicate_response
+from utils import extract_github_info, is_question, extract_sender_name, detect_duplicate_issue, group_duplicate_response, extract_issue_features, index_tokens
 
 # Configuration
 port = 8080
@@ -27,9 +33,24 @@ inbox_username = os.getenv("INBOX_USERNAME", "maintainer")
 inbox = f"{inbox_username}@agentmail.to"
 
 # Repository monitoring configuration
-target_github_repo = os.getenv("TARGET_GITHUB_REPO")
+# TARGET_GITHUB_REPOS takes a comma-separated list; TARGET_GITHUB_REPO a single repository
+target_github_repos = [
+    repo.strip()
+    for repo in os.getenv("TARGET_GITHUB_REPOS", os.getenv("TARGET_GITHUB_REPO", "")).split(",")
+    if repo.strip()
+]
+target_github_repo = ", ".join(target_github_repos) or None
 report_target_email = os.getenv("REPORT_TARGET_EMAIL")
 monitoring_interval = int(os.getenv("MONITORING_INTERVAL", "1800"))  # Default 30 minutes
+MAX_CONCURRENT_REPORTS = 4
+
+# Webhook processing concurrency and backlog before AgentMail is asked to retry
+webhook_workers = int(os.getenv("WEBHOOK_WORKERS", "8"))
+webhook_queue_size = int(os.getenv("WEBHOOK_QUEUE_SIZE", "256"))
+
+# Caps on learned state so memory and similarity scans stay bounded
+MAX_FAQ = int(os.getenv("MAX_FAQ", "2000"))
+PR_TRACKING_TTL = timedelta(days=30)
 
 if not target_github_repo:
     print("\nWARNING: TARGET_GITHUB_REPO environment variable is not set.")
@@ -41,13 +62,89 @@ if not report_target_email:
     print("The agent will not send automated reports.")
     print("Please set it in your .env file (e.g., REPORT_TARGET_EMAIL='your.email@example.com')\n")
 
-# Initialize AgentMail
-client = AgentMail()
+# Keep-alive pool shared by every AgentMail call (webhook replies and agent tools)
+AGENTMAIL_POOL_SIZE = 32
+AGENTMAIL_RETRIES = 3
+# Matches the AgentMail SDK default; a bare httpx.Client would cut it to 5s
+AGENTMAIL_TIMEOUT_SECONDS = 60.0
+
+# Initialize AgentMail once; the client and its connection pool are reused by
+# every webhook and the monitor, so never construct another one per request
+client = AgentMail(httpx_client=httpx.Client(
+    follow_redirects=True,
+    timeout=httpx.Timeout(AGENTMAIL_TIMEOUT_SECONDS),
+    transport=httpx.HTTPTransport(
+        retries=AGENTMAIL_RETRIES,
+        limits=httpx.Limits(
+            max_connections=AGENTMAIL_POOL_SIZE,
+            max_keepalive_connections=AGENTMAIL_POOL_SIZE
+        )
+    )
+))
 app = Flask(__name__)
 
-# Simple in-memory storage for basic FAQ learning and PR tracking
-faq_knowledge = {}
-pr_tracking = {}
+# Simple in-memory storage for basic FAQ learning and PR tracking, oldest first
+faq_knowledge = OrderedDict()
+pr_tracking = OrderedDict()
+
+# Significant token -> FAQ keys, so similarity checks only visit likely matches
+faq_index = defaultdict(set)
+
+# Guards the stores above, which are shared by all webhook workers
+knowledge_lock = Lock()
+
+# Increasing stamp recording each FAQ entry's position in faq_knowledge
+faq_sequence = count()
+
+def unindex_faq(question_key, entry):
+    """Remove a FAQ entry's tokens from the index"""
+    for token in index_tokens(entry['features']):
+        keys = faq_index.get(token)
+        if keys is not None:
+            keys.discard(question_key)
+            if not keys:
+                del faq_index[token]
+
+def learn_faq(question_key, question):
+    """Store a question, evicting the least recently learned entries beyond MAX_FAQ"""
+    with knowledge_lock:
+        previous = faq_knowledge.pop(question_key, None)
+        if previous:
+            unindex_faq(question_key, previous)
+        features = extract_issue_features(question)  # Cached for duplicate detection
+        faq_knowledge[question_key] = {
+            'question': question,
+            'count': (previous or {}).get('count', 0) + 1,
+            'last_seen': datetime.now().isoformat(),
+            'features': features,
+            'seq': next(faq_sequence),
+            # Key words the similar-question fallback looks for in new emails
+            'key_words': tuple(word for word in question_key.split() if len(word) > 3)
+        }
+        for token in index_tokens(features):
+            faq_index[token].add(question_key)
+        
+        while len(faq_knowledge) > MAX_FAQ:
+            evicted_key, evicted = faq_knowledge.popitem(last=False)
+            unindex_faq(evicted_key, evicted)
+
+def track_pr(pr_key, subject):
+    """Record PR activity and forget PRs not seen within PR_TRACKING_TTL"""
+    now = datetime.now()
+    with knowledge_lock:
+        pr_tracking.pop(pr_key, None)
+        pr_tracking[pr_key] = {
+            'last_seen': now,
+            'subject': subject
+        }
+        
+        # Entries are ordered by last_seen, so expired ones are at the front
+        cutoff = now - PR_TRACKING_TTL
+        while pr_tracking:
+            oldest_key = next(iter(pr_tracking))
+            if pr_tracking[oldest_key]['last_seen'] >= cutoff:
+                break
+            del pr_tracking[oldest_key]
 
 def setup_infrastructure():
     """Initialize AgentMail inbox and webhook"""
@@ -86,7 +183,9 @@ def setup_infrastructure():
     
     return True
 
-# Load system prompt from file
+# Load system prompt from file; the configuration is fixed at startup, so the
+# formatted prompt is computed once and reused by any later caller
+@lru_cache(maxsize=1)
 def load_system_prompt():
     """Load and format system prompt from System_prompt.txt"""
     try:
@@ -121,22 +220,76 @@ agent = Agent(
 
 messages = []
 
+# Outbound replies run here so webhook workers don't wait on the AgentMail round-trip.
+# Registered first so it shuts down after the webhook pool that feeds it.
+REPLY_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="reply")
+atexit.register(REPLY_POOL.shutdown, wait=True)
+
+def deliver_reply(message_id, html):
+    """Reply to a message via AgentMail (maintains thread automatically)"""
+    try:
+        client.inboxes.messages.reply(
+            inbox_id=inbox, 
+            message_id=message_id, 
+            html=html
+        )
+        print(f"Reply sent for message: {message_id}")
+    except Exception as e:
+        print(f"Error sending reply for message {message_id}: {e}")
+
+def send_reply(message_id, html):
+    """Queue a reply without blocking the calling worker"""
+    REPLY_POOL.submit(deliver_reply, message_id, html)
+
+# Fixed pool of webhook workers; the semaphore bounds running plus waiting jobs
+EXECUTOR = ThreadPoolExecutor(max_workers=webhook_workers, thread_name_prefix="wh")
+webhook_slots = BoundedSemaphore(webhook_workers + webhook_queue_size)
+atexit.register(EXECUTOR.shutdown, wait=True)
+
+# Each worker thread keeps one event loop for its agent runs
+thread_state = local()
+
+def run_async(coro):
+    """Run a coroutine on the calling thread's long-lived event loop"""
+    loop = getattr(thread_state, "loop", None)
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        thread_state.loop = loop
+    return loop.run_until_complete(coro)
+
+# Shared loop hosting periodic background tasks such as repository monitoring
+background_loop = asyncio.new_event_loop()
+background_thread = Thread(target=background_loop.run_forever, name="background-loop", daemon=True)
+
+def start_background_task(coro):
+    """Schedule a coroutine on the shared background loop, starting it on first use"""
+    if not background_thread.is_alive():
+        background_thread.start()
+    return asyncio.run_coroutine_threadsafe(coro, background_loop)
+
 @app.route("/webhooks", methods=["POST"])
 def receive_webhook():
     """Handle incoming webhook from AgentMail"""
     print(f"Received webhook: {list(request.json.keys()) if request.is_json else 'Not JSON'}")
-    Thread(target=process_webhook, args=(request.json,)).start()
+    if not webhook_slots.acquire(blocking=False):
+        # Tell AgentMail to retry later instead of queueing without limit
+        return Response(status=503)
+    future = EXECUTOR.submit(process_webhook, request.json)
+    future.add_done_callback(lambda _: webhook_slots.release())
     return Response(status=200)
 
 def process_webhook(payload):
     """Process incoming email webhook - simplified with AgentMail native memory"""
-    global messages, faq_knowledge, pr_tracking
+    global messages, faq_knowledge, faq_index, pr_tracking
     
     try:
         email = payload["message"]
         sender = email.get('from', '')
         subject = email.get('subject', '')
         body = email.get('text', '')
+        body_lower = body.lower()  # Shared by every similarity check below
+        body_words = body_lower.split()
         thread_id = email.get('thread_id')  # AgentMail handles conversation threading
         
         print(f"Processing email from: {sender}, subject: {subject}")
@@ -148,10 +301,7 @@ def process_webhook(payload):
         # Simple PR tracking for neglect detection
         if github_info['is_pr'] and github_info['pr_number']:
             pr_key = f"{github_info['repo_name']}#{github_info['pr_number']}"
-            pr_tracking[pr_key] = {
-                'last_seen': datetime.now(),
-                'subject': subject
-            }
+            track_pr(pr_key, subject)
         
         # Enhanced duplicate detection for issues
         duplicate_info = None
@@ -159,7 +309,8 @@ def process_webhook(payload):
         
         if github_info['is_issue'] and faq_knowledge:
             # Use enhanced duplicate detection
-            duplicate_info = detect_duplicate_issue(body, faq_knowledge)
+            with knowledge_lock:
+                duplicate_info = detect_duplicate_issue(body, faq_knowledge, faq_index, body_lower)
             
             if duplicate_info:
                 # Handle as duplicate - send consolidated response
@@ -171,19 +322,16 @@ def process_webhook(payload):
                 )
                 
                 # Send duplicate response directly
-                client.inboxes.messages.reply(
-                    inbox_id=inbox, 
-                    message_id=email["message_id"], 
-                    html=duplicate_response
-                )
-                print(f"Duplicate issue response sent for message: {email['message_id']}")
+                send_reply(email["message_id"], duplicate_response)
+                print(f"Duplicate issue response queued for message: {email['message_id']}")
                 return  # Skip normal processing for duplicates
             
             # Fallback to simple similarity check
-            for faq_key, faq_data in faq_knowledge.items():
-                if any(word in body.lower() for word in faq_key.split() if len(word) > 3):
-                    similar_context = f"\n\nSimilar question asked before: {faq_data['question'][:100]}..."
-                    break
+            with knowledge_lock:
+                for faq_data in faq_knowledge.values():
+                    if any(word in body_lower for word in faq_data['key_words']):
+                        similar_context = f"\n\nSimilar question asked before: {faq_data['question'][:100]}..."
+                        break
         
         # Build comprehensive prompt based on GitHub notification analysis
         if github_info['is_github']:
@@ -235,26 +383,17 @@ def process_webhook(payload):
         print("Processing with AgentMail thread context...")
         
         # Run agent (AgentMail toolkit handles thread context automatically)
-        response = asyncio.run(Runner.run(agent, messages + [{"role": "user", "content": prompt}]))
+        response = run_async(Runner.run(agent, messages + [{"role": "user", "content": prompt}]))
         print("Response:", response.final_output)
         
         # Simple FAQ learning for questions
         if is_question(body):
-            question_key = ' '.join(body.lower().split()[:10])  # First 10 words as key
-            faq_knowledge[question_key] = {
-                'question': body[:200],
-                'count': faq_knowledge.get(question_key, {}).get('count', 0) + 1,
-                'last_seen': datetime.now().isoformat()
-            }
+            question_key = ' '.join(body_words[:10])  # First 10 words as key
+            learn_faq(question_key, body[:200])
             print(f"FAQ learned. Total entries: {len(faq_knowledge)}")
         
-        # Send reply via AgentMail (maintains thread automatically)
-        client.inboxes.messages.reply(
-            inbox_id=inbox, 
-            message_id=email["message_id"], 
-            html=response.final_output
-        )
-        print(f"Reply sent for message: {email['message_id']}")
+        # Send reply in the background; the worker moves on to the next webhook
+        send_reply(email["message_id"], response.final_output)
         
         # Update agent messages for this session
         messages = response.to_input_list()
@@ -267,7 +406,10 @@ def get_neglected_prs():
     neglected = []
     cutoff_date = datetime.now() - timedelta(days=7)
     
-    for pr_key, pr_data in pr_tracking.items():
+    with knowledge_lock:
+        tracked = list(pr_tracking.items())
+    
+    for pr_key, pr_data in tracked:
         if pr_data['last_seen'] < cutoff_date:
             days_old = (datetime.now() - pr_data['last_seen']).days
             neglected.append(f"{pr_key} ({days_old} days)")
@@ -276,36 +418,15 @@ def get_neglected_prs():
 
 # --- Repository Monitoring Logic ---
 
-def monitor_repository():
-    """Monitor target repository and generate periodic reports"""
-    global messages
-    
-    if not target_github_repo or not report_target_email:
-        print("[MONITOR] Repository monitoring disabled - missing configuration")
-        return
-    
-    print(f"[MONITOR] Starting repository monitoring for {target_github_repo}")
-    print(f"[MONITOR] Reports will be sent to {report_target_email} every {monitoring_interval} seconds")
-    
-    # Give the Flask app time to start
-    time.sleep(5)
-    
-    report_count = 0
-    
-    while True:
-        try:
-            time.sleep(monitoring_interval)
-            report_count += 1
-            
-            print(f"[MONITOR] Generating repository report #{report_count} for {target_github_repo}")
-            
-            prompt_for_report = f"""
-REPOSITORY MONITORING TASK: Generate a comprehensive health report for repository '{target_github_repo}'.
+def build_report_prompt(repo, report_count):
+    """Build the health report task for one monitored repository"""
+    return f"""
+REPOSITORY MONITORING TASK: Generate a comprehensive health report for repository '{repo}'.
 
 Your goal is to create a detailed HTML email report and send it to {report_target_email} using the send_message tool.
 
 Step 1: Gather Repository Intelligence
-Use WebSearchTool to research the following aspects of '{target_github_repo}':
+Use WebSearchTool to research the following aspects of '{repo}':
 - Recent commits, releases, and development activity
 - Open issues and pull request status
 - Community engagement metrics (stars, forks, contributors)
@@ -317,7 +438,7 @@ Step 2: Generate Repository Health Report
 Based on your web search findings, create a comprehensive HTML email report with these sections:
 
 **Email Structure:**
-- Subject: "Repository Health Report: {target_github_repo} - [Current Date]"
+- Subject: "Repository Health Report: {repo} - [Current Date]"
 - Recipient: {report_target_email}
 - Inbox: {inbox}
 
@@ -372,26 +493,52 @@ Based on your web search findings, create a comprehensive HTML email report with
 
 Your final output should confirm: "Repository health report #{report_count} sent to {report_target_email}"
 """
-            
-            print(f"[MONITOR] Processing repository analysis for report #{report_count}")
+
+async def generate_report(repo, report_count, report_slots):
+    """Generate and send one repository health report"""
+    try:
+        async with report_slots:
+            print(f"[MONITOR] Generating repository report #{report_count} for {repo}")
             
             # Generate report using agent with separate message context for monitoring
             monitoring_messages = []
-            response = asyncio.run(Runner.run(agent, monitoring_messages + [{"role": "user", "content": prompt_for_report}]))
-            
-            print(f"[MONITOR] Agent response: {response.final_output}")
+            response = await Runner.run(agent, monitoring_messages + [{"role": "user", "content": build_report_prompt(repo, report_count)}])
+        
+        print(f"[MONITOR] Agent response for {repo}: {response.final_output}")
+        
+        if f"report #{report_count} sent" not in response.final_output.lower():
+            print(f"[MONITOR_WARNING] Report for {repo} may not have been sent successfully: {response.final_output}")
+        else:
+            print(f"[MONITOR] Successfully generated and sent repository report #{report_count} for {repo}")
             
-            if f"report #{report_count} sent" not in response.final_output.lower():
-                print(f"[MONITOR_WARNING] Report may not have been sent successfully: {response.final_output}")
-            else:
-                print(f"[MONITOR] Successfully generated and sent repository report #{report_count}")
-                
-        except Exception as e:
-            print(f"[MONITOR_ERROR] Error during repository monitoring: {e}")
-            import traceback
-            print(f"[MONITOR_ERROR] Traceback: {traceback.format_exc()}")
-            # Continue monitoring despite errors
-            continue
+    except Exception as e:
+        print(f"[MONITOR_ERROR] Error during repository monitoring of {repo}: {e}")
+        import traceback
+        print(f"[MONITOR_ERROR] Traceback: {traceback.format_exc()}")
+
+async def monitor_repository():
+    """Monitor target repositories and generate periodic reports"""
+    if not target_github_repos or not report_target_email:
+        print("[MONITOR] Repository monitoring disabled - missing configuration")
+        return
+    
+    print(f"[MONITOR] Starting repository monitoring for {target_github_repo}")
+    print(f"[MONITOR] Reports will be sent to {report_target_email} every {monitoring_interval} seconds")
+    
+    # Give the Flask app time to start
+    await asyncio.sleep(5)
+    
+    report_count = 0
+    # Reports for all repositories run together, with a cap on concurrent agent runs
+    report_slots = asyncio.Semaphore(MAX_CONCURRENT_REPORTS)
+    
+    while True:
+        await asyncio.sleep(monitoring_interval)
+        report_count += 1
+        
+        print(f"[MONITOR] Processing repository analysis for report #{report_count}")
+        # Errors are handled per repository, so one failure doesn't stop monitoring
+        await asyncio.gather(*(generate_report(repo, report_count, report_slots) for repo in target_github_repos))
 
 if __name__ == "__main__":
     print("Starting Advanced GitHub Maintainer Bot...")
@@ -407,15 +554,14 @@ if __name__ == "__main__":
     print("The bot will respond to emails sent to this inbox.")
     print("Features: GitHub notifications, repository monitoring, automated reports")
     
-    # Start repository monitoring thread if configured
+    # Start repository monitoring task if configured
     if target_github_repo and report_target_email:
-        print(f"Starting repository monitoring thread...")
-        monitoring_thread = Thread(target=monitor_repository)
-        monitoring_thread.daemon = True  # Exit when main thread exits
-        monitoring_thread.start()
+        print(f"Starting repository monitoring task...")
+        start_background_task(monitor_repository())
         print(f"Repository monitoring active - reports every {monitoring_interval // 60} minutes")
     else:
         print("Repository monitoring disabled - check TARGET_GITHUB_REPO and REPORT_TARGET_EMAIL")
     
-    # Start Flask app
-    app.run(host="0.0.0.0", port=port, debug=False)
+    # Serve the Flask app with a production WSGI server; a single process keeps the
+    # in-memory FAQ and PR state shared, and the threads accept webhooks in parallel
+    serve(app, host="0.0.0.0", port=port, threads=16)
@@ -3,8 +3,50 @@ Simple utility functions for the GitHub Maintainer Bot
 """
 
 import re
+import heapq
+from operator import itemgetter
 from typing import List, Dict
 
+# Patterns used on every webhook, compiled once per process
+_REPO_RE = re.compile(r'\[([^/]+/[^]]+)\]')
+_NUM_RE = re.compile(r'#(\d+)')
+_TITLE_RE = re.compile(r'#\d+:\s*(.+)$')
+_FILE_RE = re.compile(r'([a-zA-Z0-9_./\-]+\.[a-zA-Z]{1,4})')
+_ISSUE_FILE_RE = re.compile(r'([a-zA-Z0-9_./\-]+\.[a-zA-Z]{2,4})')
+_FUNC_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*\(\))')
+_AUTHOR_RES = (
+    re.compile(r'@(\w+)\s+opened'),
+    re.compile(r'@(\w+)\s+commented'),
+    re.compile(r'(\w+)\s+opened'),
+    re.compile(r'Author:\s*@?(\w+)')
+)
+_SENDER_NAME_RE = re.compile(r'^([^<]+)<')
+MAX_FILES_CHANGED = 5
+
+# Every subject phrase used to classify notifications, found in one scan. The
+# lookahead reports phrases that overlap, e.g. "pull request" inside "new pull request".
+_SUBJECT_PHRASE_RE = re.compile(
+    r'(?=(pull request|pr opened|pr #|issue|bug report|commented|comment on|replied to|'
+    r'review|approved|requested changes|opened|closed|merged|new pull request|new issue))',
+    re.IGNORECASE
+)
+_PR_PHRASES = frozenset(['pull request', 'pr opened', 'pr #'])
+_ISSUE_PHRASES = frozenset(['issue', 'bug report'])
+_COMMENT_PHRASES = frozenset(['commented', 'comment on', 'replied to'])
+_REVIEW_PHRASES = frozenset(['review', 'approved', 'requested changes'])
+_QUESTION_RE = re.compile(
+    r'\?|how|what|why|when|where|which|who|can i|could you|would you|should i|help|issue|problem|error',
+    re.IGNORECASE
+)
+
+# Key technical indicators shared by bug reports, lowercase to match lowercased text
+ERROR_KEYWORDS = frozenset([
+    'error', 'exception', 'traceback', 'stack trace', 'failed', 'crash',
+    'bug', 'broken', 'not working', 'issue', 'problem', 'typeerror',
+    'valueerror', 'attributeerror', 'importerror', 'keyerror'
+])
+DUPLICATE_THRESHOLD = 3  # Minimum similarity score for a duplicate
+
 def is_github_notification(email_from: str) -> bool:
     """Check if email is from GitHub"""
     return "github.com" in email_from.lower()
@@ -33,38 +75,38 @@ def extract_github_info(email_subject: str, email_body: str) -> Dict:
         return info
     
     # Detect notification types from subject
-    subject_lower = email_subject.lower()
+    hits = {match.group(1).lower() for match in _SUBJECT_PHRASE_RE.finditer(email_subject)}
     
     # PR detection
-    if any(phrase in subject_lower for phrase in ['pull request', 'pr opened', 'pr #']):
+    if hits & _PR_PHRASES:
         info['is_pr'] = True
-        info['is_new'] = 'opened' in subject_lower or 'new pull request' in subject_lower
-        info['is_closed'] = 'closed' in subject_lower or 'merged' in subject_lower
+        info['is_new'] = 'opened' in hits or 'new pull request' in hits
+        info['is_closed'] = 'closed' in hits or 'merged' in hits
     
     # Issue detection  
-    elif any(phrase in subject_lower for phrase in ['issue', 'bug report']) and 'pull request' not in subject_lower:
+    elif hits & _ISSUE_PHRASES and 'pull request' not in hits:
         info['is_issue'] = True
-        info['is_new'] = 'opened' in subject_lower or 'new issue' in subject_lower
-        info['is_closed'] = 'closed' in subject_lower
+        info['is_new'] = 'opened' in hits or 'new issue' in hits
+        info['is_closed'] = 'closed' in hits
     
     # Comment detection
-    elif any(phrase in subject_lower for phrase in ['commented', 'comment on', 'replied to']):
+    elif hits & _COMMENT_PHRASES:
         info['is_comment'] = True
-        info['is_pr'] = 'pull request' in subject_lower
-        info['is_issue'] = 'issue' in subject_lower and 'pull request' not in subject_lower
+        info['is_pr'] = 'pull request' in hits
+        info['is_issue'] = 'issue' in hits and 'pull request' not in hits
     
     # Review detection
-    elif any(phrase in subject_lower for phrase in ['review', 'approved', 'requested changes']):
+    elif hits & _REVIEW_PHRASES:
         info['is_review'] = True
         info['is_pr'] = True
     
     # Extract repository name [owner/repo]
-    repo_match = re.search(r'\[([^/]+/[^]]+)\]', email_subject)
+    repo_match = _REPO_RE.search(email_subject)
     if repo_match:
         info['repo_name'] = repo_match.group(1)
     
     # Extract PR/issue numbers #123
-    number_match = re.search(r'#(\d+)', email_subject)
+    number_match = _NUM_RE.search(email_subject)
     if number_match:
         number = number_match.group(1)
         if info['is_pr']:
@@ -73,27 +115,25 @@ def extract_github_info(email_subject: str, email_body: str) -> Dict:
             info['issue_number'] = number
     
     # Extract title after #number:
-    title_match = re.search(r'#\d+:\s*(.+)$', email_subject)
+    title_match = _TITLE_RE.search(email_subject)
     if title_match:
         info['title'] = title_match.group(1).strip()
     
     # Extract author from body
-    author_patterns = [
-        r'@(\w+)\s+opened',
-        r'@(\w+)\s+commented',
-        r'(\w+)\s+opened',
-        r'Author:\s*@?(\w+)'
-    ]
-    for pattern in author_patterns:
-        match = re.search(pattern, email_body)
+    for pattern in _AUTHOR_RES:
+        match = pattern.search(email_body)
         if match:
             info['author'] = match.group(1)
             break
     
-    # Extract files changed from body
-    files_match = re.findall(r'([a-zA-Z0-9_./\-]+\.[a-zA-Z]{1,4})', email_body)
-    if files_match:
-        info['files_changed'] = list(set(files_match))  # Remove duplicates
+    # Extract files changed from body, in order and without duplicates; only the
+    # first few are ever shown, so stop scanning once we have them
+    files_seen = {}
+    for match in _FILE_RE.finditer(email_body):
+        files_seen.setdefault(match.group(1), None)
+        if len(files_seen) >= MAX_FILES_CHANGED:
+            break
+    info['files_changed'] = list(files_seen)
     
     # Determine action
     if info['is_new']:
@@ -117,13 +157,7 @@ def extract_github_info(email_subject: str, email_body: str) -> Dict:
 
 def is_question(text: str) -> bool:
     """Simple check if text contains questions"""
-    question_words = [
-        'how', 'what', 'why', 'when', 'where', 'which', 'who',
-        'can i', 'could you', 'would you', 'should i',
-        'help', 'issue', 'problem', 'error'
-    ]
-    text_lower = text.lower()
-    return '?' in text or any(word in text_lower for word in question_words)
+    return _QUESTION_RE.search(text) is not None
 
 def create_welcome_response(sender_name: str, repo_name: str, is_pr: bool = False) -> str:
     """Create a simple welcome response for new contributors"""
@@ -158,62 +192,102 @@ def format_email_response(content: str, sender_name: str = "") -> str:
 {content}
 <p><em>Best regards,<br>GitHub Maintainer Bot 🤖</em></p>"""
 
-def detect_duplicate_issue(issue_body: str, faq_knowledge: dict) -> dict:
-    """Enhanced duplicate detection for bug reports"""
-    issue_lower = issue_body.lower()
-    
-    # Extract key technical indicators
-    error_keywords = [
-        'error', 'exception', 'traceback', 'stack trace', 'failed', 'crash',
-        'bug', 'broken', 'not working', 'issue', 'problem', 'TypeError',
-        'ValueError', 'AttributeError', 'ImportError', 'KeyError'
-    ]
-    
-    # Extract potential file names and functions
-    import re
-    file_patterns = re.findall(r'([a-zA-Z0-9_./\-]+\.[a-zA-Z]{2,4})', issue_body)
-    function_patterns = re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*\(\))', issue_body)
-    
-    # Score similarity with existing issues
-    best_match = None
-    highest_score = 0
+def extract_issue_features(text: str, text_lower: str = None) -> Dict:
+    """Precompute the features duplicate detection compares between issues"""
+    if text_lower is None:
+        text_lower = text.lower()
+    return {
+        'words': frozenset(text_lower.split()),
+        'files': frozenset(_ISSUE_FILE_RE.findall(text)),
+        'functions': frozenset(_FUNC_RE.findall(text)),
+        'error_kw': frozenset(keyword for keyword in ERROR_KEYWORDS if keyword in text_lower)
+    }
+
+def index_tokens(features: Dict) -> frozenset:
+    """Tokens used to index and shortlist FAQ entries.
+    Word overlap adds at most 1 and DUPLICATE_THRESHOLD is 3, so every duplicate shares
+    an error keyword, file or function with the issue and the shortlist loses nothing."""
+    return features['error_kw'] | features['files'] | features['functions']
+
+def find_faq_candidates(features: Dict, faq_index: dict) -> set:
+    """FAQ keys sharing at least one indexed token with the given issue features"""
+    return set().union(*(faq_index[token] for token in index_tokens(features) if token in faq_index))
+
+def _score_candidates(issue: Dict, candidates, faq_knowledge: dict, limit: int):
+    """Yield (score, faq_key) for stored issues that can rank in the top `limit`"""
+    issue_words = issue['words']
+    # Word overlap adds at most this much, so it is only computed when it can matter
+    max_overlap = 1 if issue_words else 0
+    # Scores of the best `limit` matches yielded so far, lowest first
+    kept = []
     
-    for faq_key, faq_data in faq_knowledge.items():
-        score = 0
-        stored_issue = faq_data.get('question', '').lower()
+    for faq_key in candidates:
+        faq_data = faq_knowledge[faq_key]
+        # Features are cached on each entry when it is learned
+        stored = faq_data.get('features') or extract_issue_features(faq_data.get('question', ''))
         
         # Check for common error keywords
-        common_errors = sum(1 for keyword in error_keywords if keyword in issue_lower and keyword in stored_issue)
-        score += common_errors * 2
+        common_errors = len(issue['error_kw'] & stored['error_kw'])
+        score = common_errors * 2
         
         # Check for common file patterns
-        stored_files = re.findall(r'([a-zA-Z0-9_./\-]+\.[a-zA-Z]{2,4})', faq_data.get('question', ''))
-        common_files = len(set(file_patterns) & set(stored_files))
+        common_files = len(issue['files'] & stored['files'])
         score += common_files * 3
         
         # Check for function patterns
-        stored_functions = re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*\(\))', faq_data.get('question', ''))
-        common_functions = len(set(function_patterns) & set(stored_functions))
+        common_functions = len(issue['functions'] & stored['functions'])
         score += common_functions * 2
         
+        # Skip entries that cannot reach the threshold or beat the current top matches
+        if score + max_overlap < DUPLICATE_THRESHOLD:
+            continue
+        if len(kept) == limit and score + max_overlap <= kept[0]:
+            continue
+        
         # Basic word overlap (for general similarity)
-        issue_words = set(issue_lower.split())
-        stored_words = set(stored_issue.split())
-        common_words = len(issue_words & stored_words)
-        if len(issue_words) > 0:
-            word_similarity = common_words / len(issue_words)
+        if issue_words:
+            word_similarity = len(issue_words & stored['words']) / len(issue_words)
             score += word_similarity * 1
         
-        if score > highest_score and score >= 3:  # Minimum threshold for duplicate
-            highest_score = score
-            best_match = {
-                'faq_key': faq_key,
-                'similarity_score': score,
-                'original_issue': faq_data.get('question', '')[:150] + '...',
-                'count': faq_data.get('count', 1)
-            }
+        if score >= DUPLICATE_THRESHOLD:
+            if len(kept) < limit:
+                heapq.heappush(kept, score)
+            elif score > kept[0]:
+                heapq.heapreplace(kept, score)
+            yield score, faq_key
+
+def find_similar_issues(issue_body: str, faq_knowledge: dict, faq_index: dict = None,
+                        issue_lower: str = None, limit: int = 1) -> List[Dict]:
+    """Return up to `limit` stored issues most similar to this one, best first"""
+    issue = extract_issue_features(issue_body, issue_lower)
     
-    return best_match
+    # Only score entries sharing a token with the issue when an index is available,
+    # visiting them in faq_knowledge order so ties resolve the same way as a full scan
+    if faq_index is None:
+        candidates = faq_knowledge
+    else:
+        candidates = sorted(
+            find_faq_candidates(issue, faq_index),
+            key=lambda faq_key: faq_knowledge[faq_key].get('seq', 0)
+        )
+    
+    # Partial selection keeps only the top matches instead of sorting every score
+    top = heapq.nlargest(limit, _score_candidates(issue, candidates, faq_knowledge, limit), key=itemgetter(0))
+    return [
+        {
+            'faq_key': faq_key,
+            'similarity_score': score,
+            'original_issue': faq_knowledge[faq_key].get('question', '')[:150] + '...',
+            'count': faq_knowledge[faq_key].get('count', 1)
+        }
+        for score, faq_key in top
+    ]
+
+def detect_duplicate_issue(issue_body: str, faq_knowledge: dict, faq_index: dict = None,
+                           issue_lower: str = None) -> dict:
+    """Enhanced duplicate detection for bug reports"""
+    matches = find_similar_issues(issue_body, faq_knowledge, faq_index, issue_lower)
+    return matches[0] if matches else None
 
 def group_duplicate_response(sender_name: str, duplicate_info: dict, repo_name: str) -> str:
     """Generate response for duplicate bug reports"""
@@ -236,7 +310,7 @@ def group_duplicate_response(sender_name: str, duplicate_info: dict, repo_name:
 def extract_sender_name(email_from: str) -> str:
     """Extract sender name from email address"""
     # Try to get name from "Name <email>" format
-    match = re.match(r'^([^<]+)<', email_from)
+    match = _SENDER_NAME_RE.match(email_from)
     if match:
         return match.group(1).strip()
     